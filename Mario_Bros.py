@@ -1,35 +1,83 @@
-from data import main
-from data import menu
 from data import config as c
+from data import sprites
+from data.replay import Recorder, Replay
 import pygame as pg
+import argparse
+import time
 import os
 import sys
 
 class App():
-    def __init__(self):
+    def __init__(self, record_path = None, replay = None, restart_args = ()):
         self.menu = None
         self.main = None
+        self.record_path = record_path
+        self.replay = replay
+        self.restart_args = restart_args #Command line arguments for going back to the menu
 
     def run(self):
-        self.menu = menu.Menu() 
-        self.menu.menu_loop()
-        if self.menu.quit_state == 'play': #Check whether to continue to game or quit app
-            self.main = main.Main()
-            self.main.main_loop()
-            if self.main.quit_state == 'menu':
-                #If you think this is a cheat 
-                #to avoid destroying instances,
-                #you are right, I'm just too
-                #lazy to do that.
-                os.execl(sys.executable, sys.executable, *sys.argv) #Restart game
+        #Imported here, loading the sounds initializes pygame with the drivers that are selected at that time
+        from data import main
+        from data import menu
+
+        #Replays start right away, they don't contain the inputs of the menu
+        if self.replay is None:
+            self.menu = menu.Menu() 
+            self.menu.menu_loop()
+            if self.menu.quit_state != 'play': #Check whether to continue to game or quit app
+                return
+
+        recorder = Recorder() if self.record_path else None
+        self.main = main.Main(recorder, self.replay)
+        self.main.main_loop()
+        if recorder is not None:
+            recorder.save(self.record_path)
+
+        if self.main.quit_state == 'menu' and self.replay is None:
+            #If you think this is a cheat 
+            #to avoid destroying instances,
+            #you are right, I'm just too
+            #lazy to do that.
+            os.execl(sys.executable, sys.executable, sys.argv[0], *self.restart_args) #Restart game
+
+def get_restart_args(args):
+    """Returns the arguments to restart the game with, the restarted game neither records nor replays
+
+    Recording again would overwrite the replay of the game that just ended.
+    """
+    return ['--uncapped'] if args.uncapped else []
+
+def run_uncapped(replay):
+    """Play a replay without window and audio as fast as possible and print how long it took"""
+    from data.headless import Headless_Game
+    game = Headless_Game()
+    start = time.perf_counter()
+    frames = game.play(replay)
+    duration = time.perf_counter() - start
+    print('%d frames in %.3f s, %.0f frames per second, score %d' % (frames, duration, frames / duration, game.main.world.total_score))
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--record', metavar = 'FILE', help = 'record the inputs of the game to a replay file')
+    parser.add_argument('--replay', metavar = 'FILE', help = 'play a replay file instead of reading the keyboard')
+    parser.add_argument('--uncapped', action = 'store_true', help = 'draw as many frames as possible, replays run headless as fast as possible')
+    args = parser.parse_args()
+
+    replay = Replay.load(args.replay) if args.replay else None
+    if replay is not None and args.uncapped:
+        run_uncapped(replay)
+        sys.exit()
+
+    if args.uncapped:
+        c.FRAME_RATE_LIMIT = 0
+
     pg.init() #Initialize pygame module
     c.screen = pg.display.set_mode((c.SCREEN_SIZE.x, c.SCREEN_SIZE.y))
     pg.display.set_caption(c.CAPTION)
+    sprites.convert_images()
     c.clock = pg.time.Clock()
 
-    app = App()
+    app = App(args.record, replay, get_restart_args(args))
     app.run()
 
-    pg.quit()
\ No newline at end of file
+    pg.quit()
@@ -1,27 +1,36 @@
 from . import config as c
 from . import sprites
 import pygame as pg
+import numpy as np
+import heapq
 import math
 
 class Game_Object():
-    def __init__(self, rect):
+    def __init__(self, world, rect):
+        self.world = world
         self.rect = rect
 
-    def __getattr__(self, name):
-        """Makes lines shorter by not having to type rect.pos when retrieving position"""
-        if name == 'pos':
-            return self.rect.pos
-        return object.__getattribute__(self, name)
+    @property
+    def pos(self):
+        """Makes lines shorter by not having to type rect.pos"""
+        return self.rect.pos
+
+    @pos.setter
+    def pos(self, value):
+        self.rect.pos = value
+
+    def get_snapshot(self):
+        """Returns the state of the object as plain values, see World.snapshot"""
+        return (self.pos.x, self.pos.y, self.rect.w, self.rect.h)
+
+    def restore_snapshot(self, snapshot):
+        """Sets the state returned by get_snapshot"""
+        self.pos.x, self.pos.y, self.rect.w, self.rect.h = snapshot[:4]
 
-    def __setattr__(self, name, value):
-        """Makes lines shorter by not having to type rect.pos when setting position"""
-        if name == 'pos':
-            self.rect.pos = value
-        else:
-            object.__setattr__(self, name, value)
-        
 class Vector2():
     """Vector class for 2D positions and velocities"""
+    __slots__ = ('x', 'y')
+
     def __init__(self, x = 0, y = 0):
         self.x = x
         self.y = y
@@ -34,10 +43,29 @@ class Vector2():
         """Overload Addition"""
         return Vector2(self.x + other.x, self.y + other.y)
 
+    def __imul__(self, other):
+        """In-place multiplication, doesn't create a new vector"""
+        self.x *= other
+        self.y *= other
+        return self
+
+    def __iadd__(self, other):
+        """In-place addition, doesn't create a new vector"""
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def add_scaled(self, x, y, scale):
+        """Adds (x, y) * scale in place, used for integrating velocities and accelerations"""
+        self.x += x * scale
+        self.y += y * scale
+
 class Rectangle():
     """Rectangle class for collider rectangles"""
-    def __init__(self, pos = Vector2(), w = 0, h = 0):
-        self.pos = pos
+    __slots__ = ('pos', 'w', 'h')
+
+    def __init__(self, pos = None, w = 0, h = 0):
+        self.pos = pos if pos is not None else Vector2()
         self.w = w
         self.h = h
 
@@ -64,15 +92,503 @@ class Rectangle():
                     others.append(entity)
         return others
 
+class Tile_Grid():
+    """Dense grid of tile sized cells, every cell holds the colliders that cover it"""
+    def __init__(self, columns, rows, cell_size, offset_y):
+        self.columns = columns
+        self.rows = rows
+        self.cell_size = cell_size
+        self.offset_y = offset_y #Tiles start this far below a multiple of the cell size
+        self.cells = [()] * (columns * rows)
+        self.object_cells = {} #object -> (x0, y0, x1, y1) cell range it was inserted into
+        self.order = {} #object -> insertion number, the first inserted collider wins when several overlap
+        self.inserted = 0
+
+    def get_range(self, rect):
+        """Returns the first and last column and row a rectangle covers, clamped to the grid"""
+        return self.get_box_range(rect.pos.x, rect.pos.y, rect.w, rect.h)
+
+    def get_box_range(self, x, y, w, h):
+        """Same as get_range, for a box that isn't stored in a rectangle"""
+        size = self.cell_size
+        x0 = math.floor(x / size)
+        y0 = math.floor((y - self.offset_y) / size)
+        x1 = max(x0, math.ceil((x + w) / size) - 1)
+        y1 = max(y0, math.ceil((y + h - self.offset_y) / size) - 1)
+        return (max(x0, 0), max(y0, 0), min(x1, self.columns - 1), min(y1, self.rows - 1))
+
+    def insert(self, obj):
+        """Add an object to all cells its rectangle covers"""
+        self.order[obj] = self.inserted
+        self.inserted += 1
+        self.add_to_cells(obj, self.get_range(obj.rect))
+
+    def remove(self, obj):
+        """Remove an object from the grid, does nothing if it isn't in it"""
+        if obj in self.object_cells:
+            self.remove_from_cells(obj)
+            del self.order[obj]
+
+    def update(self, obj):
+        """Move an object to the cells of its current rectangle, call after changing its position"""
+        cell_range = self.get_range(obj.rect)
+        if cell_range != self.object_cells[obj]:
+            self.remove_from_cells(obj)
+            self.add_to_cells(obj, cell_range)
+
+    def add_to_cells(self, obj, cell_range):
+        x0, y0, x1, y1 = cell_range
+        for y in range(y0, y1 + 1):
+            for x in range(x0, x1 + 1):
+                self.cells[y * self.columns + x] += (obj,)
+        self.object_cells[obj] = cell_range
+
+    def remove_from_cells(self, obj):
+        x0, y0, x1, y1 = self.object_cells.pop(obj)
+        for y in range(y0, y1 + 1):
+            for x in range(x0, x1 + 1):
+                index = y * self.columns + x
+                self.cells[index] = tuple(other for other in self.cells[index] if other is not obj)
+
+class Collision_World():
+    """Owns the colliders of the level and keeps the tile grid and box arrays in sync when they are added, moved or removed"""
+    def __init__(self, columns, rows):
+        self.static_colliders = Object_List()
+        self.dynamic_colliders = Object_List() #Tiles that get updated and drawn every frame
+        self.grid = Tile_Grid(columns, rows, c.TILE_SIZE, c.TILE_OFFSET_Y)
+
+        #Colliders as rows of x, y, w, h for batched queries, removed colliders are swapped with the last row
+        self.boxes = np.zeros((64, 4))
+        self.box_orders = np.zeros(64, dtype = np.int64)
+        self.box_dynamic = np.zeros(64, dtype = bool)
+        self.box_colliders = []
+        self.box_slots = {} #collider -> row in boxes
+        self.removed = [] #Taken out of the collider lists by compact at the end of the frame
+
+    def add_static(self, collider):
+        self.static_colliders.append(collider)
+        self.add_box(collider, False)
+
+    def add_dynamic(self, collider):
+        self.dynamic_colliders.append(collider)
+        self.add_box(collider, True)
+
+    def add_box(self, collider, dynamic):
+        self.grid.insert(collider)
+
+        slot = len(self.box_colliders)
+        if slot == len(self.boxes):
+            self.boxes = np.resize(self.boxes, (2 * slot, 4))
+            self.box_orders = np.resize(self.box_orders, 2 * slot)
+            self.box_dynamic = np.resize(self.box_dynamic, 2 * slot)
+        self.box_colliders.append(collider)
+        self.box_slots[collider] = slot
+        self.box_orders[slot] = self.grid.order[collider]
+        self.box_dynamic[slot] = dynamic
+        self.set_box(collider)
+
+    def set_box(self, collider):
+        self.boxes[self.box_slots[collider]] = (collider.pos.x, collider.pos.y, collider.rect.w, collider.rect.h)
+
+    def remove(self, collider):
+        """Remove a collider, does nothing if it was removed before
+
+        It stops colliding right away, but stays in static_colliders or dynamic_colliders until compact is called.
+        """
+        if collider in self.grid.object_cells:
+            self.removed.append(collider)
+            self.grid.remove(collider)
+
+            slot = self.box_slots.pop(collider)
+            last = self.box_colliders.pop()
+            if last is not collider:
+                self.box_colliders[slot] = last
+                self.box_slots[last] = slot
+                self.boxes[slot] = self.boxes[len(self.box_colliders)]
+                self.box_orders[slot] = self.box_orders[len(self.box_colliders)]
+                self.box_dynamic[slot] = self.box_dynamic[len(self.box_colliders)]
+
+    def compact(self):
+        """Take removed colliders out of the collider lists, call once per frame"""
+        for collider in self.removed:
+            self.static_colliders.remove(collider)
+            self.dynamic_colliders.remove(collider)
+        self.removed = []
+
+    def get_snapshot(self):
+        """Returns the uids of the colliders and the order they were added in, see World.snapshot"""
+        count = len(self.box_colliders)
+        return ([collider.uid for collider in self.static_colliders],
+                [collider.uid for collider in self.dynamic_colliders],
+                [collider.uid for collider in self.box_colliders],
+                self.box_orders[:count].tolist(),
+                self.grid.inserted)
+
+    def restore_snapshot(self, snapshot, get_object):
+        """Sets the colliders of a snapshot, the positions of the dynamic colliders have to be restored already"""
+        static_colliders, dynamic_colliders, box_colliders, orders, inserted = snapshot
+        self.static_colliders = Object_List(get_object(uid) for uid in static_colliders)
+        self.dynamic_colliders = Object_List(get_object(uid) for uid in dynamic_colliders)
+        self.removed = []
+        box_colliders = [get_object(uid) for uid in box_colliders]
+
+        #Going back a few frames usually keeps the same colliders, then only the tiles that bounced have to move
+        if box_colliders == self.box_colliders and orders == self.box_orders[:len(orders)].tolist():
+            for collider in self.dynamic_colliders:
+                self.move(collider)
+            return
+
+        dynamic = set(self.dynamic_colliders)
+        self.grid = Tile_Grid(self.grid.columns, self.grid.rows, c.TILE_SIZE, c.TILE_OFFSET_Y)
+        self.box_colliders = []
+        self.box_slots = {}
+        for collider, order in zip(box_colliders, orders):
+            self.add_box(collider, collider in dynamic)
+            self.grid.order[collider] = order
+            self.box_orders[self.box_slots[collider]] = order
+        self.grid.inserted = inserted
+
+    def move(self, collider):
+        """Call after changing the position of a collider"""
+        self.grid.update(collider)
+        self.set_box(collider)
+
+    def sweep(self, rect, dist_x, dist_y):
+        """Returns the first collider a rectangle hit while moving dist_x or dist_y to its current position"""
+        return self.sweep_box(rect.pos.x, rect.pos.y, rect.w, rect.h, dist_x, dist_y)
+
+    def sweep_box(self, x, y, w, h, dist_x, dist_y):
+        """Same as sweep, for a box that isn't stored in a rectangle"""
+        #Checking the whole swept area means fast movers and long frames can't tunnel through tiles
+        start_x = x - dist_x
+        start_y = y - dist_y
+        left = min(start_x, x)
+        top = min(start_y, y)
+        width = w + abs(dist_x)
+        height = h + abs(dist_y)
+        right = left + width
+        bottom = top + height
+
+        grid = self.grid
+        order = grid.order
+        x0, y0, x1, y1 = grid.get_box_range(left, top, width, height)
+
+        first = None
+        first_key = None
+        for y in range(y0, y1 + 1):
+            row = y * grid.columns
+            for x in range(x0, x1 + 1):
+                for collider in grid.cells[row + x]:
+                    other = collider.rect
+                    if (other.pos.x + other.w <= left or other.pos.x >= right or
+                        other.pos.y + other.h <= top or other.pos.y >= bottom):
+                        continue
+
+                    #Distance moved before touching the collider, colliders that were already overlapping are hit first
+                    if dist_x > 0:
+                        entry = collider.pos.x - (start_x + w)
+                    elif dist_x < 0:
+                        entry = start_x - (collider.pos.x + collider.rect.w)
+                    elif dist_y > 0:
+                        entry = collider.pos.y - (start_y + h)
+                    elif dist_y < 0:
+                        entry = start_y - (collider.pos.y + collider.rect.h)
+                    else:
+                        entry = 0
+
+                    key = (max(entry, 0), order[collider])
+                    if first_key is None or key < first_key:
+                        first = collider
+                        first_key = key
+        return first
+
+    def sweep_batch(self, boxes, dists, axis):
+        """Sweep many rectangles along one axis at once
+
+        boxes holds x, y, w, h of every rectangle at its new position and dists how far each moved along
+        the axis (0 = x, 1 = y). Returns the row of the first collider each rectangle hit, or -1, and the
+        position along the axis that puts the rectangle against that collider.
+        """
+        #Below this many rectangles looking up the cells of each one is faster than testing all colliders at once
+        if len(boxes) < c.SWEEP_BATCH_MIN:
+            return self.sweep_each(boxes, dists, axis)
+        return self.sweep_all(boxes, dists, axis)
+
+    def sweep_each(self, boxes, dists, axis):
+        """Same as sweep_batch, sweeps the rectangles one by one through the tile grid"""
+        hits = []
+        positions = []
+        for (x, y, w, h), dist in zip(boxes.tolist(), dists.tolist()):
+            collider = self.sweep_box(x, y, w, h, 0, dist) if axis else self.sweep_box(x, y, w, h, dist, 0)
+            if collider is None:
+                hits.append(-1)
+                positions.append(y if axis else x)
+                continue
+
+            hits.append(self.box_slots[collider])
+            if axis:
+                positions.append(collider.pos.y - h if dist > 0 else collider.pos.y + collider.rect.h)
+            else:
+                positions.append(collider.pos.x - w if dist > 0 else collider.pos.x + collider.rect.w)
+        return np.array(hits, dtype = np.int64), np.array(positions)
+
+    def sweep_all(self, boxes, dists, axis):
+        """Same as sweep_batch, tests every rectangle against every collider in one NumPy operation"""
+        count = len(self.box_colliders)
+        hits = np.full(len(boxes), -1)
+        positions = boxes[:, axis].copy()
+        if count == 0 or len(boxes) == 0:
+            return hits, positions
+
+        colliders = self.boxes[:count]
+        other = 1 - axis
+
+        #Same bounds as sweep, [:, None] puts movers along the rows and colliders along the columns
+        pos = boxes[:, axis]
+        size = boxes[:, axis + 2]
+        start = pos - dists
+        low = np.minimum(start, pos)
+        high = low + (size + np.abs(dists))
+        overlap = ((colliders[:, axis] + colliders[:, axis + 2] > low[:, None]) &
+                   (colliders[:, axis] < high[:, None]) &
+                   (colliders[:, other] + colliders[:, other + 2] > boxes[:, other, None]) &
+                   (colliders[:, other] < boxes[:, other, None] + boxes[:, other + 2, None]))
+
+        entry = np.where(dists[:, None] > 0,
+                         colliders[:, axis] - (start + size)[:, None],
+                         start[:, None] - (colliders[:, axis] + colliders[:, axis + 2]))
+        entry = np.where(overlap, np.maximum(entry, 0), np.inf)
+
+        #Nearest collider first, ties go to the collider that was added first
+        nearest = entry == entry.min(axis = 1)[:, None]
+        first = np.where(overlap & nearest, self.box_orders[:count], np.iinfo(np.int64).max).argmin(axis = 1)
+
+        hit = overlap.any(axis = 1)
+        hits[hit] = first[hit]
+        hit_boxes = colliders[first]
+        positions = np.where(dists > 0,
+                             hit_boxes[:, axis] - size,
+                             hit_boxes[:, axis] + hit_boxes[:, axis + 2])
+        positions = np.where(hit, positions, pos)
+        return hits, positions
+
+    def move_batch(self, movers, delta_time):
+        """Move entities along x and then y, resolving tile collisions of all of them with one sweep_batch per axis"""
+        for axis in (0, 1):
+            moving = [mover for mover in movers if (mover.vel.y if axis else mover.vel.x) != 0]
+            if not moving:
+                continue
+
+            #Velocities at the time of moving, responses of earlier movers can change them
+            vels = [mover.vel.y if axis else mover.vel.x for mover in moving]
+            for mover, vel in zip(moving, vels):
+                if axis:
+                    mover.pos.y += vel * delta_time
+                else:
+                    mover.pos.x += vel * delta_time
+            boxes = np.array([(mover.pos.x, mover.pos.y, mover.rect.w, mover.rect.h) for mover in moving])
+            dists = np.array(vels) * delta_time
+
+            hits, positions = self.sweep_batch(boxes, dists, axis)
+            for mover, vel, hit, position in zip(moving, vels, hits.tolist(), positions.tolist()):
+                other_collider = self.box_colliders[hit] if hit >= 0 else None
+                if axis:
+                    mover.on_move(0, vel, other_collider, position)
+                else:
+                    mover.on_move(vel, 0, other_collider, position)
+
+class Sweep_And_Prune():
+    """Finds entities that are close enough to collide by sorting them on the x axis once per frame"""
+    def __init__(self):
+        self.sorted_entities = [] #Kept between frames, so sorting a mostly sorted list is cheap
+        self.order = {} #entity -> position in the lists given to update
+        self.source = {} #entity -> id of the list it was given in
+        self.candidates = {} #entity -> entities whose x range overlaps its x range
+
+    def update(self, entity_lists, margin):
+        """Find candidate pairs, margin is the distance an entity can move along x before the next update"""
+        self.order = {}
+        self.source = {}
+        for entity_list in entity_lists:
+            for entity in entity_list:
+                self.order[entity] = len(self.order)
+                self.source[entity] = id(entity_list)
+
+        kept = [entity for entity in self.sorted_entities if entity in self.order]
+        kept_set = set(kept)
+        self.sorted_entities = kept + [entity for entity in self.order if entity not in kept_set]
+        self.sorted_entities.sort(key = lambda entity: entity.pos.x)
+
+        self.candidates = {entity: [] for entity in self.sorted_entities}
+        active = []
+        for entity in self.sorted_entities:
+            start = entity.pos.x - margin
+            active = [other for other in active if other.pos.x + other.rect.w + margin > start]
+            for other in active:
+                self.candidates[entity].append(other)
+                self.candidates[other].append(entity)
+            active.append(entity)
+
+    def remove(self, entity):
+        """Stop returning an entity as a candidate, call when an entity is destroyed mid frame"""
+        self.order.pop(entity, None)
+
+    def get_snapshot(self):
+        """Only the sorted order carries over between frames, it decides the order of entities with the same x"""
+        return [entity.uid for entity in self.sorted_entities]
+
+    def restore_snapshot(self, snapshot, get_object):
+        self.sorted_entities = [get_object(uid) for uid in snapshot]
+        self.order = {}
+        self.source = {}
+        self.candidates = {}
+
+    def get_candidates(self, entity, entity_list = None):
+        """Returns entities that can overlap an entity, in the order they were given, optionally only those from entity_list"""
+        candidates = [other for other in self.candidates.get(entity, ()) if other in self.order]
+        if entity_list is not None:
+            candidates = [other for other in candidates if self.source[other] == id(entity_list)]
+        return sorted(candidates, key = self.order.__getitem__)
+
+class Object_List():
+    """Objects in the order they were added, removing one takes the same time however long the list is
+
+    A dict keeps the objects in insertion order, so they are iterated like a list would be, but removing one
+    neither searches for it nor moves the ones after it.
+    """
+    __slots__ = ('objects',)
+
+    def __init__(self, objects = ()):
+        self.objects = dict.fromkeys(objects)
+
+    def append(self, obj):
+        self.objects[obj] = None
+
+    def extend(self, objects):
+        for obj in objects:
+            self.objects[obj] = None
+
+    def remove(self, obj):
+        """Remove an object, does nothing if it isn't in the list"""
+        self.objects.pop(obj, None)
+
+    def clear(self):
+        self.objects.clear()
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def __len__(self):
+        return len(self.objects)
+
+    def __contains__(self, obj):
+        return obj in self.objects
+
+class Pool():
+    """Keeps released objects so they can be reused instead of allocating new ones"""
+    def __init__(self, create):
+        self.create = create
+        self.free = []
+
+    def acquire(self):
+        return self.free.pop() if self.free else self.create()
+
+    def release(self, obj):
+        self.free.append(obj)
+
+class Scheduler():
+    """Keeps the objects of every kind that need updating in an active set, objects waiting for the camera are kept in a heap sorted by x"""
+    def __init__(self):
+        self.active = {} #kind -> dict used as an ordered set of active objects
+        self.waiting = set()
+        self.queue = [] #(x, number, object) of waiting objects, number keeps equal x in the order they were added
+        self.queued = 0
+
+    def activate(self, kind, obj):
+        self.active.setdefault(kind, {})[obj] = None
+
+    def deactivate(self, kind, obj):
+        """Stop updating an object, does nothing if it isn't active"""
+        self.active.get(kind, {}).pop(obj, None)
+
+    def remove(self, kind, obj):
+        """Forget an object that has been destroyed, whether it is active or still waiting"""
+        self.deactivate(kind, obj)
+        self.waiting.discard(obj)
+
+    def get_active(self, kind):
+        """Returns the active objects of a kind in the order they were activated, as a list that can be changed while iterating"""
+        return list(self.active.get(kind, ()))
+
+    def wait_for_camera(self, obj, x):
+        """Call obj.activate() once the right edge of the camera passes x"""
+        heapq.heappush(self.queue, (x, self.queued, obj))
+        self.queued += 1
+        self.waiting.add(obj)
+
+    def activate_reached(self, camera_right):
+        """Activates waiting objects the right edge of the camera has passed, only looks at the front of the queue"""
+        while self.queue and self.queue[0][0] < camera_right:
+            x, number, obj = heapq.heappop(self.queue)
+            if obj in self.waiting:
+                self.waiting.discard(obj)
+                obj.activate()
+
+    def clear(self):
+        self.active = {}
+        self.waiting = set()
+        self.queue = []
+
+    def get_snapshot(self):
+        """Returns the scheduled objects as uids, the queue keeps its heap order"""
+        return ([(kind, [obj.uid for obj in active]) for kind, active in self.active.items()],
+                sorted(obj.uid for obj in self.waiting),
+                [(x, number, obj.uid) for x, number, obj in self.queue],
+                self.queued)
+
+    def restore_snapshot(self, snapshot, get_object):
+        active, waiting, queue, self.queued = snapshot
+        self.active = {kind: dict.fromkeys(get_object(uid) for uid in uids) for kind, uids in active}
+        self.waiting = set(get_object(uid) for uid in waiting)
+        self.queue = [(x, number, get_object(uid)) for x, number, uid in queue]
+
 class Entity(Game_Object):
     """Entity class for Gameobjects that possess velocity"""
-    def __init__(self, vel, rect):
-        super(Entity, self).__init__(rect)
+    def __init__(self, world, vel, rect):
+        super(Entity, self).__init__(world, rect)
         self.vel = vel
 
+    def get_snapshot(self):
+        return super(Entity, self).get_snapshot() + (self.vel.x, self.vel.y)
+
+    def restore_snapshot(self, snapshot):
+        super(Entity, self).restore_snapshot(snapshot)
+        self.vel.x, self.vel.y = snapshot[4:6]
+
+class Interpolator():
+    """Remembers positions before a simulation step, so drawing can blend between the last two steps"""
+    def __init__(self):
+        self.previous = {} #position vector -> (x, y) before the last step
+        self.alpha = 1 #Fraction of the next step that has passed when drawing
+
+    def store(self, positions):
+        self.previous = {pos: (pos.x, pos.y) for pos in positions}
+
+    def get(self, pos):
+        """Returns x and y blended between the previous and the current step, positions that weren't stored aren't blended"""
+        previous = self.previous.get(pos)
+        if previous is None:
+            return pos.x, pos.y
+        return (previous[0] + (pos.x - previous[0]) * self.alpha,
+                previous[1] + (pos.y - previous[1]) * self.alpha)
+
 class Camera(Rectangle):
-    def __init__(self, pos, w, h):
+    __slots__ = ('world', 'view_x')
+
+    def __init__(self, world, pos, w, h):
         super(Camera, self).__init__(pos, w, h)
+        self.world = world
+        self.view_x = pos.x #Interpolated x used while drawing, see Main.draw
     
     def contains(self, other):
         """Checks if camera horizontally contains a rectangle"""
@@ -80,41 +596,74 @@ class Camera(Rectangle):
                 (other.pos.x + other.w > self.pos.x and other.pos.x + other.w < self.pos.x + c.SCREEN_SIZE.x))
 
     def to_view_space(self, pos):
-        """Returns position relative to camera"""
-        return Vector2(pos.x - self.pos.x, pos.y)
+        """Returns position relative to camera, interpolated between simulation steps"""
+        x, y = self.world.interpolator.get(pos)
+        return Vector2(x - self.view_x, y)
 
     def update(self):
         """Update position of camera based on mario velocity and position"""
-        if self.pos.x < c.MAXIMUM_CAMERA_SCROLL:
-            if c.mario.pos.x > c.camera.pos.x + c.CAMERA_FOLLOW_X and c.mario.vel.x > 0:
-                c.camera.pos.x += c.mario.vel.x * c.delta_time
+        mario = self.world.mario
+        if self.pos.x < self.world.maximum_camera_scroll:
+            if mario.pos.x > self.pos.x + c.CAMERA_FOLLOW_X and mario.vel.x > 0:
+                self.pos.x += mario.vel.x * self.world.delta_time
+
+class State_Table():
+    """Transitions of a state machine compiled to a table, shared by all state machines of one kind of owner
+
+    states maps state ids to State classes, the table keeps one instance of each that all owners share,
+    so states keep no values of their own. transitions maps state ids to {event id: next state id},
+    events a state has no transition for leave it in its state.
+    """
+    def __init__(self, states, transitions, event_count):
+        size = max(states) + 1
+        self.states = [None] * size
+        for state_id, state in states.items():
+            self.states[state_id] = state()
+
+        rows = []
+        for state_id in range(size):
+            row = [state_id] * event_count
+            for event, next_state in transitions.get(state_id, {}).items():
+                row[event] = next_state
+            rows.append(tuple(row))
+        self.transitions = tuple(rows)
+
+    def get_mask(self, *state_ids):
+        """Returns a tuple indexed by state id that is True for the given states, for checking states with a lookup"""
+        return tuple(state_id in state_ids for state_id in range(len(self.states)))
 
 class State_Machine():
-    """Manages states"""
-    def __init__(self, initial_state, owner_object):
-        self.state = initial_state
+    """Manages states, the current state is an id of a State_Table"""
+    def __init__(self, table, initial_state, owner_object):
+        self.states = table.states
+        self.transitions = table.transitions
+        self.state_id = initial_state
+        self.state = self.states[initial_state]
         self.owner_object = owner_object
 
     def on_event(self, event):
-        """Updates current state and runs on_exit and on_enter"""
-        new_state = self.state.on_event(event)
-        if new_state is not self.state:
+        """Looks up the next state for an event id and runs on_exit and on_enter if it changes"""
+        new_id = self.transitions[self.state_id][event]
+        if new_id != self.state_id:
             self.state.on_exit(self.owner_object)
-            self.state = new_state
+            self.state_id = new_id
+            self.state = self.states[new_id]
             self.state.on_enter(self.owner_object)
 
     def update(self):
         self.state.update(self.owner_object)
 
-    def get_state(self):
-        return self.state.__class__.__name__
+    def get_snapshot(self):
+        """States keep no values, their owners do, so the id of the current state is all there is"""
+        return self.state_id
 
-class State():
-    """State Class"""
-    def on_event(self, event):
-        """Handles events delegated to this state"""
-        pass
+    def restore_snapshot(self, snapshot):
+        """Sets the state without calling on_exit and on_enter"""
+        self.state_id = snapshot
+        self.state = self.states[snapshot]
 
+class State():
+    """State Class, one instance is shared by all owners of a State_Table"""
     def on_enter(self, owner_object):
         """Performs actions when entering state"""
         pass
@@ -147,11 +696,11 @@ class Digit_System():
         else:
             self.digit_array = [0] * self.number_of_digits
     
-    def draw(self):
+    def draw(self, screen):
         """Draw the digit system"""
         for i, x in enumerate(self.digit_array):
             #Digit width = 24
-            c.screen.blit(sprites.digits, (self.start_pos.x + 24 * i, self.start_pos.y), (24 * x, 0, 24, 21))
+            screen.blit(sprites.digit_images[x], (self.start_pos.x + 24 * i, self.start_pos.y))
 
     def get_number_of_digits(self, value):
         """Gets the number of digits in an integer"""
@@ -1,80 +1,276 @@
 from .. import config as c
-from ..basetypes import Vector2, Entity, State, State_Machine, Rectangle
+from ..basetypes import Vector2, Entity, State, State_Machine, State_Table
 from .. import sprites
 from .. import sounds
-from ..utils import accelerate
-from .. import level
+from ..utils import get_attributes, set_attributes
+import numpy as np
+
+#Columns of the arrays Enemy_Store.move copies the moving enemies into
+POS_X, POS_Y, VEL_X, VEL_Y, WIDTH, HEIGHT, COLLIDES = range(7)
+
+class Enemy_Store():
+    """Keeps the enemies of a stage in slots and runs the physics of all moving enemies at once
+
+    Enemies keep their position and velocity in plain vectors, so code looking at a single enemy stays cheap.
+    move copies the moving enemies into arrays, runs gravity, moving and tile collisions on all of them
+    and copies the results back.
+    """
+    def __init__(self, capacity):
+        self.enemies = [None] * max(capacity, 1) #slot -> enemy, enemies move in the order of their slots
+        self.slots = {} #enemy -> slot
+        self.free = list(range(len(self.enemies) - 1, -1, -1))
+
+    def add(self, enemy):
+        """Puts an enemy into a free slot"""
+        if not self.free:
+            self.grow()
+        slot = self.free.pop()
+        self.enemies[slot] = enemy
+        self.slots[enemy] = slot
+
+    def remove(self, enemy):
+        """Frees the slot of an enemy, does nothing if it was removed before"""
+        slot = self.slots.pop(enemy, None)
+        if slot is not None:
+            self.enemies[slot] = None
+            self.free.append(slot)
+
+    def grow(self):
+        """Doubles the number of slots"""
+        capacity = len(self.enemies)
+        self.enemies += [None] * capacity
+        self.free = list(range(2 * capacity - 1, capacity - 1, -1)) + self.free
+
+    def get_snapshot(self):
+        """Returns the enemy uid of every slot and the free slots, see World.snapshot"""
+        return ([enemy.uid if enemy is not None else -1 for enemy in self.enemies], list(self.free))
+
+    def restore_snapshot(self, snapshot, get_object):
+        """Puts every enemy back into the slot it had, the number of slots never shrinks"""
+        uids, free = snapshot
+        while len(self.enemies) < len(uids):
+            self.grow()
+        capacity = len(self.enemies)
+
+        self.enemies = [None] * capacity
+        self.slots = {}
+        self.free = list(range(capacity - 1, len(uids) - 1, -1)) + free
+        for slot, uid in enumerate(uids):
+            if uid >= 0:
+                enemy = get_object(uid)
+                self.enemies[slot] = enemy
+                self.slots[enemy] = slot
+
+    def has_neighbours(self, enemy, sweep):
+        """Checks if another enemy is among the sweep and prune candidates of an enemy"""
+        return any(other in self.slots for other in sweep.candidates.get(enemy, ()))
+
+    def gather(self, movers):
+        """Returns the columns of a row per mover as an array"""
+        return np.array([(enemy.pos.x, enemy.pos.y, enemy.vel.x, enemy.vel.y, enemy.rect.w, enemy.rect.h, enemy.collides)
+                         for enemy in movers], dtype = float)
+
+    def scatter(self, movers, values):
+        """Copies positions and velocities of the rows back to the movers"""
+        for enemy, (x, y, vel_x, vel_y) in zip(movers, values[:, :VEL_Y + 1].tolist()):
+            enemy.pos.x = x
+            enemy.pos.y = y
+            enemy.vel.x = vel_x
+            enemy.vel.y = vel_y
+
+    def move(self, collision_world, sweep, delta_time):
+        """Apply gravity and move all moving enemies along x and then y
+
+        Bouncing off walls and landing on the ground is done by the store. Enemies that hit a tile which can
+        knock them or that are close to another enemy get after_move called to handle that themselves.
+        """
+        movers = [enemy for enemy in self.enemies if enemy is not None and enemy.moving]
+        if len(movers) >= c.SWEEP_BATCH_MIN:
+            self.move_batch(movers, collision_world, sweep, delta_time)
+        elif movers:
+            self.move_each(movers, collision_world, sweep, delta_time)
+
+    def move_each(self, movers, collision_world, sweep, delta_time):
+        """Same as move_batch for a few enemies, moves them one by one instead of copying them into arrays"""
+        for enemy in movers:
+            enemy.vel.y += c.GRAVITY * delta_time
+        neighbours = [self.has_neighbours(enemy, sweep) for enemy in movers]
+
+        for axis in (0, 1):
+            #All enemies move before the first after_move, like they do in move_batch
+            handlers = []
+            for enemy, near in zip(movers, neighbours):
+                vel = enemy.vel.y if axis else enemy.vel.x
+                if vel == 0:
+                    continue
+                dist = vel * delta_time
+                if axis:
+                    enemy.pos.y += dist
+                    other_collider = collision_world.sweep(enemy.rect, 0, dist)
+                else:
+                    enemy.pos.x += dist
+                    other_collider = collision_world.sweep(enemy.rect, dist, 0)
+                if not enemy.collides:
+                    continue
+
+                if other_collider is not None:
+                    if not axis:
+                        enemy.pos.x = other_collider.pos.x - enemy.rect.w if dist > 0 else other_collider.pos.x + other_collider.rect.w
+                        enemy.vel.x = -vel
+                    elif dist > 0:
+                        enemy.pos.y = other_collider.pos.y - enemy.rect.h
+                        enemy.vel.y = 0
+                    near = near or collision_world.box_dynamic[collision_world.box_slots[other_collider]]
+                if near:
+                    handlers.append((enemy, vel, other_collider))
+
+            for enemy, vel, other_collider in handlers:
+                if enemy in self.slots:
+                    if axis:
+                        enemy.after_move(0, vel, other_collider)
+                    else:
+                        enemy.after_move(vel, 0, other_collider)
+
+    def move_batch(self, movers, collision_world, sweep, delta_time):
+        """Copies the movers into arrays, so gravity, moving and tile collisions run on all of them at once"""
+        values = self.gather(movers)
+        values[:, VEL_Y] += c.GRAVITY * delta_time
+        neighbours = np.array([self.has_neighbours(enemy, sweep) for enemy in movers], dtype = bool)
+
+        for axis in (0, 1):
+            pos = values[:, POS_Y if axis else POS_X]
+            vel = values[:, VEL_Y if axis else VEL_X]
+            moved = np.flatnonzero(vel != 0)
+            if len(moved) == 0:
+                continue
+
+            vels = vel[moved]
+            dists = vels * delta_time
+            pos[moved] += dists
+            boxes = values[moved][:, [POS_X, POS_Y, WIDTH, HEIGHT]]
+            hits, positions = collision_world.sweep_batch(boxes, dists, axis)
+
+            #Bounce back from walls, land on the ground and keep the velocity when bumping a ceiling
+            collides = values[moved, COLLIDES] != 0
+            hit = collides & (hits >= 0)
+            if axis:
+                hit &= dists > 0
+                vel[moved[hit]] = 0
+            else:
+                vel[moved[hit]] = -vels[hit]
+            pos[moved[hit]] = positions[hit]
+            self.scatter(movers, values)
+
+            dynamic = np.zeros(len(moved), dtype = bool)
+            dynamic[hits >= 0] = collision_world.box_dynamic[hits[hits >= 0]]
+            handlers = np.flatnonzero(collides & (dynamic | neighbours[moved])).tolist()
+            for i in handlers:
+                enemy = movers[moved[i]]
+                if enemy not in self.slots: #Removed by an earlier enemy this frame
+                    continue
+                other_collider = collision_world.box_colliders[hits[i]] if hits[i] >= 0 else None
+                if axis:
+                    enemy.after_move(0, float(vels[i]), other_collider)
+                else:
+                    enemy.after_move(float(vels[i]), 0, other_collider)
+
+            #after_move can push, turn or knock enemies
+            if handlers:
+                values = self.gather(movers)
+
+class Enemy(Entity):
+    """Base class for enemies, the enemy store of the world moves them"""
+    #State ids of all kinds of enemies, so states can be checked without knowing the kind
+    RUN_STATE, KNOCKED_STATE, SQUISH_STATE, DEAD_STATE, SHELL_STATE, MOVE_SHELL = range(6)
+
+    def __init__(self, world, rect, vel):
+        super(Enemy, self).__init__(world, vel, rect)
+        self.is_active = False
+        self.moving = False #Moved by the enemy store this frame
+        self.collides = True #Knocked enemies fall through everything
+        self.world.enemy_store.add(self)
+        self.world.scheduler.wait_for_camera(self, self.pos.x)
+
+    def activate(self):
+        """Start updating and drawing the enemy, called when the camera reaches it or when it gets hit by a shell"""
+        if not self.is_active:
+            self.is_active = True
+            self.world.scheduler.activate('enemies', self)
 
-class Goomba(Entity):
+    def check_for_destroy(self):
+        """Checks if instance can be destroyed"""
+        if self.pos.y > c.SCREEN_SIZE.y:
+            self.world.remove_enemy(self)
+
+    def bounce_off(self, other):
+        """Pushes two enemies apart by their overlap and turns them away from each other, call after moving along x
+
+        Both walked into each other, so each takes half of the overlap. Enemies standing still, like shells,
+        stay where they are and the enemy that walked into them takes all of it.
+        """
+        overlap = min(self.pos.x + self.rect.w, other.pos.x + other.rect.w) - max(self.pos.x, other.pos.x)
+        direction = -1 if self.pos.x + self.rect.w / 2 < other.pos.x + other.rect.w / 2 else 1
+        if other.vel.x != 0:
+            self.pos.x += direction * overlap / 2
+            other.pos.x -= direction * overlap / 2
+            other.vel.x = -direction * abs(other.vel.x)
+        else:
+            self.pos.x += direction * overlap
+        self.vel.x = direction * abs(self.vel.x)
+
+    def get_snapshot(self):
+        return super(Enemy, self).get_snapshot() + (self.is_active, self.moving, self.collides,
+                                                    get_attributes(self.animation), self.state_machine.get_snapshot())
+
+    def restore_snapshot(self, snapshot):
+        super(Enemy, self).restore_snapshot(snapshot)
+        self.is_active, self.moving, self.collides, animation, state = snapshot[6:11]
+        set_attributes(self.animation, animation)
+        self.state_machine.restore_snapshot(state)
+
+class Goomba(Enemy):
     """Goomba class"""
-    def __init__(self, rect, vel):
-        super(Goomba, self).__init__(vel, rect)
-        self.animation = self.Animation()
-        self.state_machine = State_Machine(self.Run_State(), self)
+    def __init__(self, world, rect, vel):
+        super(Goomba, self).__init__(world, rect, vel)
+        self.animation = self.Animation(world)
+        self.state_machine = State_Machine(self.state_table, self.RUN_STATE, self)
         self.vel.x = c.ENEMY_START_VEL_X
 
-        self.is_active = False
         self.can_kill = True
 
     def draw(self):
-        view_pos = c.camera.to_view_space(self.pos)
-        if c.camera.contains(self.rect):
-            c.screen.blit(sprites.tile_set, (view_pos.x, view_pos.y), self.animation.current_sprite)
+        view_pos = self.world.camera.to_view_space(self.pos)
+        if self.world.camera.contains(self.rect):
+            self.world.screen.blit(sprites.images[self.animation.current_sprite], (view_pos.x, view_pos.y))
 
     def update(self):
+        """Update state, gravity and moving is done for all enemies at once by Enemy_Store.move"""
         self.state_machine.update()
+        self.moving = False
         if self.is_active:
-            if all(self.state_machine.get_state() != state for state in ['Squish_State', 'Dead_State']):
-                accelerate(self, 0, c.GRAVITY)
-                self.move()
+            if self.MOVES[self.state_machine.state_id]:
+                self.moving = True
+
+    def late_update(self):
+        """Update after all movers have moved"""
         self.check_for_destroy()
 
-    def check_for_destroy(self):
-        """Checks if instance can be destroyed"""
-        if self.pos.y > c.SCREEN_SIZE.y:
-            level.enemies.remove(self)
-
-    def move(self):
-        """Splits up x and y movement"""
-        if self.vel.x != 0:
-            self.move_single_axis(self.vel.x, 0)
-        if self.vel.y != 0:
-            self.move_single_axis(0, self.vel.y)
-
-    def move_single_axis(self, dx, dy):
-        """Updates position"""
-        self.pos.x += dx * c.delta_time
-        self.pos.y += dy * c.delta_time
-        if self.state_machine.get_state() != 'Knocked_State':
-            self.check_collisions(dx, dy)
-
-    def check_collisions(self, dx, dy):
-        """Checks whether x or y movement caused collisions"""
-        other_collider = self.rect.check_collisions(level.static_colliders + level.dynamic_colliders)
-        other_enemy = self.rect.check_collisions([enemy for enemy in level.enemies if enemy is not self and enemy.is_active])
-
-        if other_collider is None and other_enemy is None:
-            return
-        if other_collider is not None:
-            if dx > 0:
-                self.pos.x = other_collider.pos.x - self.rect.w
-                self.vel.x = -self.vel.x
-            elif dx < 0:
-                self.pos.x = other_collider.pos.x + other_collider.rect.w
-                self.vel.x = -self.vel.x
-            elif dy > 0:
-                self.pos.y = other_collider.pos.y - self.rect.h
-                self.vel.y = 0
-        if hasattr(other_collider, 'state_machine') and any(other_collider.state_machine.get_state() == state for state in ['Bounce_State', 'Break_State']):
-            self.state_machine.on_event('knocked')
-        if other_enemy is not None:
-            self.pos.x -= dx * c.delta_time
-            self.vel.x = -self.vel.x
+    def after_move(self, dx, dy, other_collider):
+        """Handles knocking tiles and other enemies after moving along one axis, tiles were already resolved"""
+        other_enemy = self.rect.check_collisions([enemy for enemy in self.world.entity_sweep.get_candidates(self, self.world.enemies) if enemy.is_active])
+
+        if hasattr(other_collider, 'state_machine') and other_collider.KNOCKING[other_collider.state_machine.state_id]:
+            self.state_machine.on_event(c.KNOCKED)
+
+        #Only moving along x turns enemies around, moving shells knock the goomba instead
+        if other_enemy is not None and dx != 0 and other_enemy.state_machine.state_id != self.MOVE_SHELL:
+            self.bounce_off(other_enemy)
 
 
     class Animation():
         """Contains specific animation variables and functions for this class"""
-        def __init__(self):
+        def __init__(self, world):
+            self.world = world
             self.current_sprite = sprites.GOOMBA_RUN[0]
 
             self.anim_timer = c.INITIAL_TIMER_VALUE
@@ -85,15 +281,15 @@ class Goomba(Entity):
         def run_anim(self):
             """Animation when running"""
             self.current_sprite = sprites.GOOMBA_RUN[self.anim_frame % 2]
-            self.anim_timer += c.delta_time
-            if self.anim_timer > 14 * c.delta_time:
+            self.anim_timer += self.world.delta_time
+            if self.anim_timer > 14 * self.world.delta_time:
                 self.anim_frame += 1
                 self.anim_timer = 0
 
         def squish_delay(self):
             """Make goomba remain for a certain amount of time after being squished"""
-            self.anim_timer += c.delta_time
-            if self.anim_timer > 20 * c.delta_time:
+            self.anim_timer += self.world.delta_time
+            if self.anim_timer > 20 * self.world.delta_time:
                 self.squish_delay_over = True
 
         def reset_anim_vars(self):
@@ -103,13 +299,6 @@ class Goomba(Entity):
 
     class Run_State(State):
         """State when running around"""
-        def on_event(self, event):
-            if event == 'knocked':
-                return Goomba.Knocked_State()
-            elif event == 'squish':
-                return Goomba.Squish_State()
-            return self
-
         def update(self, owner_object):
             owner_object.animation.run_anim()
 
@@ -118,110 +307,91 @@ class Goomba(Entity):
 
     class Knocked_State(State):
         """State when knocked by brick block or turtle shell"""
-        def on_event(self, event):
-            if event == 'dead':
-                return Goomba.Dead_State()
-            return self
-
         def on_enter(self, owner_object):
             owner_object.vel.y = c.GOOMBA_KNOCKED_VEL_Y
+            owner_object.collides = False
             owner_object.animation.current_sprite = sprites.GOOMBA_KNOCKED
-            c.total_score += c.GOOMBA_SCORE
+            owner_object.world.total_score += c.GOOMBA_SCORE
             sounds.kick.play()
 
     class Squish_State(State):
         """State when getting squished"""
-        def on_event(self, event):
-            if event == 'dead':
-                return Goomba.Dead_State()
-            return self
-    
         def on_enter(self, owner_object):
             owner_object.animation.current_sprite = sprites.GOOMBA_SQUISHED
-            owner_object.rect = Rectangle(owner_object.pos, 0, 0)
+            owner_object.rect.w = 0
+            owner_object.rect.h = 0
             sounds.stomp.play()
-            c.total_score += c.GOOMBA_SCORE
+            owner_object.world.total_score += c.GOOMBA_SCORE
 
         def update(self, owner_object):
             owner_object.animation.squish_delay()
             if owner_object.animation.squish_delay_over:
-                owner_object.state_machine.on_event('dead')
+                owner_object.state_machine.on_event(c.DEAD)
 
     class Dead_State(State):
         """State when dead, destroys instance of goomba"""
         def on_enter(self, owner_object):
-            level.enemies.remove(owner_object)
+            owner_object.world.remove_enemy(owner_object)
+
+    state_table = State_Table({Enemy.RUN_STATE: Run_State, Enemy.KNOCKED_STATE: Knocked_State,
+                               Enemy.SQUISH_STATE: Squish_State, Enemy.DEAD_STATE: Dead_State},
+                              {Enemy.RUN_STATE: {c.KNOCKED: Enemy.KNOCKED_STATE, c.SQUISH: Enemy.SQUISH_STATE},
+                               Enemy.KNOCKED_STATE: {c.DEAD: Enemy.DEAD_STATE},
+                               Enemy.SQUISH_STATE: {c.DEAD: Enemy.DEAD_STATE}},
+                              c.EVENT_COUNT)
 
-class Turtle(Entity):
+    #States in which goombas move, indexed by state id
+    MOVES = state_table.get_mask(Enemy.RUN_STATE, Enemy.KNOCKED_STATE)
+
+class Turtle(Enemy):
     """Turtle Class"""
-    def __init__(self, rect, vel):
-        super(Turtle, self).__init__(vel, rect)
-        self.animation = self.Animation()
-        self.state_machine = State_Machine(self.Run_State(), self)
+    def __init__(self, world, rect, vel):
+        super(Turtle, self).__init__(world, rect, vel)
+        self.animation = self.Animation(world)
+        self.state_machine = State_Machine(self.state_table, self.RUN_STATE, self)
         self.vel.x = c.ENEMY_START_VEL_X
-        self.is_active = False
 
         self.can_kill = True
+        self.can_kill_timer = 0 #Time since the shell started moving
 
     def update(self):
-        if self.is_active:
-            accelerate(self, 0, c.GRAVITY)
-            self.move()
+        """Gravity and moving is done for all enemies at once by Enemy_Store.move"""
+        self.moving = self.is_active
+
+    def late_update(self):
+        """Update after all movers have moved"""
+        if self.moving:
             self.state_machine.update()
         self.check_for_destroy()
 
+    def get_snapshot(self):
+        return super(Turtle, self).get_snapshot() + (self.can_kill, self.can_kill_timer)
+
+    def restore_snapshot(self, snapshot):
+        super(Turtle, self).restore_snapshot(snapshot)
+        self.can_kill, self.can_kill_timer = snapshot[11:]
+
     def draw(self):
-        view_pos = c.camera.to_view_space(self.pos)
-        if c.camera.contains(self.rect):
-            c.screen.blit(sprites.tile_set, (view_pos.x, view_pos.y), self.animation.current_sprite)
-    
-    def check_for_destroy(self):
-        """Checks if instance can be destroyed"""
-        if self.pos.y > c.SCREEN_SIZE.y:
-            level.enemies.remove(self)
-    
-    def move(self):
-        if self.vel.x != 0:
-            self.move_single_axis(self.vel.x, 0)
-        if self.vel.y != 0:
-            self.move_single_axis(0, self.vel.y)
-
-    def move_single_axis(self, dx, dy):
-        """Move position based on velocity"""
-        self.pos.x += dx * c.delta_time
-        self.pos.y += dy * c.delta_time
-        if self.state_machine.get_state() != 'Knocked_State':
-            self.check_collisions(dx, dy)
-
-    def check_collisions(self, dx, dy):
-        """Checks if x or y movement caused collisions and performs according actions"""
-        other_collider = self.rect.check_collisions(level.static_colliders + level.dynamic_colliders)
-        other_enemy = self.rect.check_collisions([enemy for enemy in level.enemies if enemy is not self])
-
-        if other_collider is None and other_enemy is None:
-            return
-        if other_collider is not None:
-            if dx > 0:
-                self.pos.x = other_collider.pos.x - self.rect.w
-                self.vel.x = -self.vel.x
-            elif dx < 0:
-                self.pos.x = other_collider.pos.x + other_collider.rect.w
-                self.vel.x = -self.vel.x
-            elif dy > 0:
-                self.pos.y = other_collider.pos.y - self.rect.h
-                self.vel.y = 0
+        view_pos = self.world.camera.to_view_space(self.pos)
+        if self.world.camera.contains(self.rect):
+            self.world.screen.blit(sprites.images[self.animation.current_sprite], (view_pos.x, view_pos.y))
+
+
+    def after_move(self, dx, dy, other_collider):
+        """Handles collisions with other enemies after moving along one axis, tiles were already resolved"""
+        other_enemy = self.rect.check_collisions(self.world.entity_sweep.get_candidates(self, self.world.enemies))
 
         if other_enemy is not None:
-            if self.state_machine.get_state() != 'Move_Shell':
-                self.pos.x -= dx * c.delta_time
-                self.vel.x = -self.vel.x
-            else:
-                other_enemy.state_machine.on_event('knocked')
-                other_enemy.is_active = True
+            if self.state_machine.state_id == self.MOVE_SHELL:
+                other_enemy.state_machine.on_event(c.KNOCKED)
+                other_enemy.activate()
+            elif dx != 0 and other_enemy.state_machine.state_id != self.MOVE_SHELL:
+                self.bounce_off(other_enemy)
 
     class Animation():
         """Contains specific animation variables and functions for this class"""
-        def __init__(self):
+        def __init__(self, world):
+            self.world = world
             self.current_sprite = sprites.TURTLE[0]
 
             self.anim_timer = 0
@@ -229,28 +399,18 @@ class Turtle(Entity):
 
         def run_anim(self):
             self.current_sprite = sprites.TURTLE[self.anim_frame % 2]
-            self.anim_timer += c.delta_time
-            if self.anim_timer > 13 * c.delta_time:
+            self.anim_timer += self.world.delta_time
+            if self.anim_timer > 13 * self.world.delta_time:
                 self.anim_frame += 1
                 self.anim_timer = 0
 
     class Run_State(State):
         """State when running around"""
-        def on_event(self, event):
-            if event == 'squish':
-                return Turtle.Shell_State()
-            return self
-
         def update(self, owner_object):
             owner_object.animation.run_anim()
 
     class Shell_State(State):
         """State when turtle is in its shell"""
-        def on_event(self, event):
-            if event == 'move shell':
-                return Turtle.Move_Shell()
-            return self
-
         def on_enter(self, owner_object):
             owner_object.rect.h = 42
             owner_object.pos.y += 30
@@ -261,16 +421,16 @@ class Turtle(Entity):
 
     class Move_Shell(State):
         """State when turtle is in its shell and moving"""
-        def __init__(self):
-            self.can_kill_timer = 0
-
-        def on_event(self, event):
-            return self
-
         def on_enter(self, owner_object):
+            owner_object.can_kill_timer = 0
             sounds.kick.play()
 
         def update(self, owner_object):
-            self.can_kill_timer += c.delta_time
-            if self.can_kill_timer > 10 * c.delta_time:
+            owner_object.can_kill_timer += owner_object.world.delta_time
+            if owner_object.can_kill_timer > 10 * owner_object.world.delta_time:
                 owner_object.can_kill = True
+
+    state_table = State_Table({Enemy.RUN_STATE: Run_State, Enemy.SHELL_STATE: Shell_State, Enemy.MOVE_SHELL: Move_Shell},
+                              {Enemy.RUN_STATE: {c.SQUISH: Enemy.SHELL_STATE},
+                               Enemy.SHELL_STATE: {c.MOVE_SHELL: Enemy.MOVE_SHELL}},
+                              c.EVENT_COUNT)
@@ -2,17 +2,22 @@ from ..basetypes import Game_Object, Vector2, Entity
 from .. import config as c
 from .. import sprites
 from .. import sounds
-from .. import level
-from ..utils import accelerate
+from ..utils import accelerate, get_attributes, set_attributes
 
 class Coin(Game_Object):
     """Coin item class"""
-    def __init__(self, rect):
-        super(Coin, self).__init__(rect)
-        self.animation = self.Animation(self.pos.y)
+    def __init__(self, world, rect):
+        super(Coin, self).__init__(world, rect)
+        self.animation = self.Animation(world, self.pos.y)
         self.deployed = False
         self.collected = False
 
+    def deploy(self):
+        """Start the coin animation, called when the question block holding it gets hit"""
+        if not self.deployed:
+            self.deployed = True
+            self.world.scheduler.activate('coins', self)
+
     def update(self):
         self.animation.anim()
         self.pos.y = self.animation.new_y
@@ -24,15 +29,25 @@ class Coin(Game_Object):
     def check_for_destroy(self):
         """Checks if instance can be destroyed"""
         if self.collected:
-            level.coins.remove(self)
+            self.world.destroy(self.world.coins, self)
+            self.world.scheduler.remove('coins', self)
+
+    def get_snapshot(self):
+        return super(Coin, self).get_snapshot() + (self.deployed, self.collected, get_attributes(self.animation))
+
+    def restore_snapshot(self, snapshot):
+        super(Coin, self).restore_snapshot(snapshot)
+        self.deployed, self.collected, animation = snapshot[-3:]
+        set_attributes(self.animation, animation)
 
     def draw(self):
-        view_pos = c.camera.to_view_space(self.pos)
-        c.screen.blit(sprites.tile_set, (view_pos.x, view_pos.y), self.animation.current_sprite)
+        view_pos = self.world.camera.to_view_space(self.pos)
+        self.world.screen.blit(sprites.images[self.animation.current_sprite], (view_pos.x, view_pos.y))
 
     class Animation():
         """Contains specific animation variables and functions for this class"""
-        def __init__(self, start_height):
+        def __init__(self, world, start_height):
+            self.world = world
             self.current_sprite = sprites.COIN[0]
 
             self.start_height = start_height
@@ -44,8 +59,8 @@ class Coin(Game_Object):
         def anim(self):
             """Spinning animation"""
             self.current_sprite = sprites.COIN[self.anim_frame % 4]
-            self.anim_timer += c.delta_time
-            if self.anim_timer > 3 * c.delta_time:
+            self.anim_timer += self.world.delta_time
+            if self.anim_timer > 3 * self.world.delta_time:
                 self.anim_frame += 1
                 self.anim_timer = 0
             self.bounce_iteration += 0.6
@@ -58,58 +73,69 @@ class Coin(Game_Object):
 
 class Super_Mushroom(Entity):
     """Super mushroom class"""
-    def __init__(self, rect, vel):
-        super(Super_Mushroom, self).__init__(vel, rect)
+    def __init__(self, world, rect, vel):
+        super(Super_Mushroom, self).__init__(world, vel, rect)
 
         self.deployed = False
         self.collected = False
+        self.moving = False
 
         self.animation = self.Animation(self.pos.y)
 
     def draw(self):
-        view_pos = c.camera.to_view_space(self.pos)
-        c.screen.blit(sprites.tile_set, (view_pos.x, view_pos.y), sprites.SUPER_MUSHROOM)
+        view_pos = self.world.camera.to_view_space(self.pos)
+        self.world.screen.blit(sprites.images[sprites.SUPER_MUSHROOM], (view_pos.x, view_pos.y))
+
+    def deploy(self):
+        """Start the deploy animation, called when the question block holding it has opened"""
+        if not self.deployed:
+            self.deployed = True
+            self.world.scheduler.activate('mushrooms', self)
 
     def update(self):
-        if self.animation.has_animated:
+        """Update velocity or deploy animation, moving is done for all movers at once by Collision_World.move_batch"""
+        self.moving = self.animation.has_animated
+        if self.moving:
             accelerate(self, 0, c.GRAVITY)
-            self.move()
         else:
             self.animation.deploy_anim()
             self.pos.y = self.animation.new_y
 
+    def late_update(self):
+        """Update after all movers have moved"""
         self.check_for_destroy()
 
     def check_for_destroy(self):
         """Checks if instance can be destroyed"""
         if self.collected:
             sounds.powerup.play()
-            c.total_score += c.MUSHROOM_SCORE
-            level.super_mushrooms.remove(self)
-
-    def move(self):
-        """Separates x and y movement"""
-        if self.vel.x != 0:
-            self.move_single_axis(self.vel.x, 0)
-        if self.vel.y != 0:
-            self.move_single_axis(0, self.vel.y)
-
-    def move_single_axis(self, dx, dy):
-        """Checks to see whether x or y movement caused collisions"""
-        self.pos.x += dx * c.delta_time
-        self.pos.y += dy * c.delta_time
-        other_collider = self.rect.check_collisions(level.static_colliders + level.dynamic_colliders)
-
+            self.world.total_score += c.MUSHROOM_SCORE
+            self.world.destroy(self.world.super_mushrooms, self)
+            self.world.entity_sweep.remove(self)
+            self.world.scheduler.remove('mushrooms', self)
+            self.world.forget(self)
+
+    def get_snapshot(self):
+        return super(Super_Mushroom, self).get_snapshot() + (self.deployed, self.collected, self.moving,
+                                                               get_attributes(self.animation))
+
+    def restore_snapshot(self, snapshot):
+        super(Super_Mushroom, self).restore_snapshot(snapshot)
+        self.deployed, self.collected, self.moving, animation = snapshot[-4:]
+        set_attributes(self.animation, animation)
+
+    def on_move(self, dx, dy, other_collider, position):
+        """Called after moving along one axis, position puts the mushroom against the tile it hit"""
         if other_collider is None:
             return
         if dx > 0:
-            self.pos.x = other_collider.pos.x - self.rect.w
+            self.pos.x = position
             self.vel.x = -self.vel.x
         elif dx < 0:
-            self.pos.x = other_collider.pos.x + other_collider.rect.w
+            self.pos.x = position
             self.vel.x = -self.vel.x
         elif dy > 0:
-            self.pos.y = other_collider.pos.y - self.rect.h
+            self.pos.y = position
             self.vel.y = 0
         
     class Animation():
@@ -1,19 +1,21 @@
-from ..basetypes import Game_Object, Vector2, Entity, Rectangle, State_Machine, State
+from ..basetypes import Game_Object, Vector2, Entity, Rectangle, State_Machine, State_Table, State
 from .. import config as c
 from .. import sprites
 from .. import sounds
-from ..utils import accelerate, clamp, get_flipped_sprite
-from .. import level
+from ..utils import accelerate, clamp, get_attributes, set_attributes
 import pygame as pg
-import random
 
 class Mario(Entity):
     """Mario Class"""
-    def __init__(self, rect, vel = Vector2()):
-        super(Mario, self).__init__(vel, rect)
-        self.animation = self.Animation()
-        self.action_states = State_Machine(self.Idle_State(), self)
-        self.mario_states = State_Machine(self.Small_Mario(), self)
+    #Ids of the action states and of the mario states, the transitions are at the end of the class
+    IDLE_STATE, JUMP_STATE, NO_JUMP_STATE, MOVE_STATE, BRAKE_STATE, DECEL_STATE, CROUCH_STATE = range(7)
+    SMALL_MARIO, GROW_MARIO, BIG_MARIO, SHRINK_MARIO, INVINCIBLE_MARIO, DEAD_MARIO, WIN_STATE = range(7)
+
+    def __init__(self, world, rect, vel = None):
+        super(Mario, self).__init__(world, vel if vel is not None else Vector2(), rect)
+        self.animation = self.Animation(world)
+        self.action_states = State_Machine(self.action_table, self.IDLE_STATE, self)
+        self.mario_states = State_Machine(self.mario_table, self.SMALL_MARIO, self)
 
         self.pressed_left = False
         self.pressed_right = False
@@ -27,58 +29,82 @@ class Mario(Entity):
 
         self.start_height = 0
 
-    def __getattr__(self, name):
-        """Shorter variable calls"""
-        if name == 'current_action_state':
-            return self.action_states.get_state()
-        elif name == 'pos':
-            return self.rect.pos
-        elif name == 'current_mario_state':
-            return self.mario_states.get_state()
-        return object.__getattribute__(self, name)
+        #Timers of the mario states, states are shared between all marios
+        self.invincible_timer = 0
+        self.blink_timer = 0
+        self.death_timer = 0
+        self.win_step = 0
+        self.win_timer = 0
+
+    @property
+    def current_action_state(self):
+        """Shorter variable calls, returns the id of the state"""
+        return self.action_states.state_id
+
+    @property
+    def current_mario_state(self):
+        return self.mario_states.state_id
+
+    def get_snapshot(self):
+        return super(Mario, self).get_snapshot() + ((self.pressed_left, self.pressed_right, self.spacebar, self.crouch,
+                                                      self.freeze_movement, self.freeze_input, self.flip_sprites,
+                                                      self.to_menu, self.start_height, self.invincible_timer,
+                                                      self.blink_timer, self.death_timer, self.win_step, self.win_timer),
+                                                     get_attributes(self.animation),
+                                                     self.action_states.get_snapshot(),
+                                                     self.mario_states.get_snapshot())
+
+    def restore_snapshot(self, snapshot):
+        super(Mario, self).restore_snapshot(snapshot)
+        flags, animation, action_state, mario_state = snapshot[-4:]
+        (self.pressed_left, self.pressed_right, self.spacebar, self.crouch, self.freeze_movement,
+         self.freeze_input, self.flip_sprites, self.to_menu, self.start_height, self.invincible_timer,
+         self.blink_timer, self.death_timer, self.win_step, self.win_timer) = flags
+        set_attributes(self.animation, animation)
+        self.action_states.restore_snapshot(action_state)
+        self.mario_states.restore_snapshot(mario_state)
 
     def draw(self):
         """Extract sprite from atlas"""
-        if c.camera.contains(self.rect):
-            view_pos = c.camera.to_view_space(self.pos)
+        if self.world.camera.contains(self.rect):
+            view_pos = self.world.camera.to_view_space(self.pos)
             if self.flip_sprites:
-                flipped_sprite = get_flipped_sprite(self.animation.current_sprite)
-                c.screen.blit(sprites.tile_set_flipped, (view_pos.x, view_pos.y), flipped_sprite)
+                self.world.screen.blit(sprites.flipped_images[self.animation.current_sprite], (view_pos.x, view_pos.y))
             else:
-                c.screen.blit(sprites.tile_set, (view_pos.x, view_pos.y), self.animation.current_sprite)
+                self.world.screen.blit(sprites.images[self.animation.current_sprite], (view_pos.x, view_pos.y))
 
     def update(self):
         """Get input and perform actions"""
         if not self.freeze_input:
-            if c.keys[pg.K_a] and not c.keys[pg.K_d]:
+            if self.world.keys[pg.K_a] and not self.world.keys[pg.K_d]:
                 self.pressed_left = True
-                c.ACCELERATION = -c.MARIO_ACCELERATION
-            elif c.keys[pg.K_d] and not c.keys[pg.K_a]:
+                self.world.acceleration = -c.MARIO_ACCELERATION
+            elif self.world.keys[pg.K_d] and not self.world.keys[pg.K_a]:
                 self.pressed_right = True
-                c.ACCELERATION = c.MARIO_ACCELERATION
+                self.world.acceleration = c.MARIO_ACCELERATION
             else:
-                c.ACCELERATION = 0
+                self.world.acceleration = 0
             
-            if not c.keys[pg.K_a]:
+            if not self.world.keys[pg.K_a]:
                 self.pressed_left = False
-            if not c.keys[pg.K_d]:
+            if not self.world.keys[pg.K_d]:
                 self.pressed_right = False
 
-            if c.keys[pg.K_SPACE] and not self.spacebar:
+            if self.world.keys[pg.K_SPACE] and not self.spacebar:
                 self.spacebar = True
-                self.action_states.on_event('jump')
+                self.action_states.on_event(c.JUMP)
             
-            if not c.keys[pg.K_SPACE]:
+            if not self.world.keys[pg.K_SPACE]:
                 self.spacebar = False
 
-            if c.keys[pg.K_s]:
+            if self.world.keys[pg.K_s]:
                 self.crouch = True
             else:
                 self.crouch = False
 
     def physics_update(self):
         """Perform actions based on input"""
-        if self.current_mario_state != 'Invincible_Mario':
+        if self.mario_states.state_id != self.INVINCIBLE_MARIO:
             self.mario_states.update()
 
         if not self.freeze_movement:
@@ -88,22 +114,22 @@ class Mario(Entity):
 
             #Make sure that mario can't jump when running off a ledge
             if self.pos.y > self.start_height:
-                self.action_states.on_event('no jump')
+                self.action_states.on_event(c.NO_JUMP)
                 
             self.check_flip_sprites()
 
-        if self.current_mario_state == 'Invincible_Mario':
+        if self.mario_states.state_id == self.INVINCIBLE_MARIO:
             self.mario_states.update()
 
         self.rect.h = self.animation.current_sprite[3]
 
         if self.pos.y > c.SCREEN_SIZE.y:
-            self.mario_states.on_event('dead')
+            self.mario_states.on_event(c.DEAD)
 
     def movement(self):
         """Aggregates movement related statements"""
-        accelerate(self, c.ACCELERATION, c.GRAVITY, c.MAX_VEL)
-        self.vel.x *= c.FRICTION
+        accelerate(self, self.world.acceleration, c.GRAVITY, c.MAX_VEL)
+        self.vel.x *= self.world.friction
         self.move()
 
     def check_flip_sprites(self):
@@ -115,37 +141,38 @@ class Mario(Entity):
 
     def state_events(self):
         """Change current state based on events and perform actions based on current state"""
-        if any(self.current_action_state == state for state in ['Move_State', 'Decel_State', 'Brake_State', 'Idle_State']):
+        if self.ON_GROUND[self.action_states.state_id]:
             self.start_height = self.pos.y
 
         if self.vel.y == 0:
             if self.pressed_left or self.pressed_right:
-                self.action_states.on_event('move')
+                self.action_states.on_event(c.MOVE)
 
             if ((self.vel.x < 0 and not self.pressed_left) or
                 (self.vel.x > 0 and not self.pressed_right)):
-                self.action_states.on_event('decel')
+                self.action_states.on_event(c.DECEL)
             
             if ((self.vel.x < 0 and self.pressed_right) or
                 (self.vel.x > 0 and self.pressed_left)):
-                self.action_states.on_event('brake')
+                self.action_states.on_event(c.BRAKE)
 
-            if abs(self.vel.x) < 0.02 and self.current_action_state != 'Move_State':
+            if abs(self.vel.x) < 0.02 and self.action_states.state_id != self.MOVE_STATE:
                 self.vel.x = 0
-                self.action_states.on_event('idle')
+                self.action_states.on_event(c.IDLE)
 
-        if all(self.current_action_state != state for state in ['Decel_State', 'Brake_State', 'Crouch_State']):
-            c.FRICTION = 1
+        action_state = self.action_states.state_id
+        if not self.SLOWING_DOWN[action_state]:
+            self.world.friction = 1
 
-        if any(self.current_action_state == state for state in ['Jump_State', 'No_Jump_State']):
+        if self.IN_AIR[action_state]:
             if self.animation.mario_size == 'Small_Mario':
                 self.animation.current_sprite = sprites.SMALL_MARIO_JUMP
             else:
                 self.animation.current_sprite = sprites.BIG_MARIO_JUMP
 
-        if self.current_mario_state == 'Big_Mario':
+        if self.mario_states.state_id == self.BIG_MARIO:
             if self.crouch:
-                self.action_states.on_event('crouch')
+                self.action_states.on_event(c.CROUCH)
 
     def move(self):
         """Separates x and y movement"""
@@ -156,97 +183,98 @@ class Mario(Entity):
 
     def move_single_axis(self, dx, dy):
         """Move based on velocity and check for collisions based on new position"""
-        self.pos.x += dx * c.delta_time
-        self.pos.y += dy * c.delta_time
+        self.pos.x += dx * self.world.delta_time
+        self.pos.y += dy * self.world.delta_time
 
         self.collider_collisions(dx, dy)
-        if self.current_mario_state != 'Invincible_Mario':
+        if self.mario_states.state_id != self.INVINCIBLE_MARIO:
             self.check_entity_collisions() 
 
         self.check_backtrack()
 
     def check_backtrack(self):
         """Stop mario from backtracking in the level"""
-        if self.pos.x < c.camera.pos.x:
-            self.pos.x = clamp(self.pos.x, c.camera.pos.x, c.SCREEN_SIZE.x)
+        if self.pos.x < self.world.camera.pos.x:
+            self.pos.x = clamp(self.pos.x, self.world.camera.pos.x, c.SCREEN_SIZE.x)
             self.vel.x = 0   
-            if all(self.current_action_state != state for state in ["Jump_State", "No_Jump_State"]):
-                self.action_states.on_event('idle')      
+            if not self.IN_AIR[self.action_states.state_id]:
+                self.action_states.on_event(c.IDLE)      
 
     def collider_collisions(self, dx, dy):
         """Check for collisions with tiles"""
-        other_collider = self.rect.check_collisions(level.static_colliders + level.dynamic_colliders)
+        other_collider = self.world.collision_world.sweep(self.rect, dx * self.world.delta_time, dy * self.world.delta_time)
 
         if other_collider is None:
             return
         if dx > 0:
-            if self.current_action_state == 'Move_State':
-                self.action_states.on_event('idle')
+            if self.action_states.state_id == self.MOVE_STATE:
+                self.action_states.on_event(c.IDLE)
             self.pos.x = other_collider.pos.x - self.rect.w
             self.vel.x = 0
         elif dx < 0:
-            if self.current_action_state == 'Move_State':
-                self.action_states.on_event('idle')
+            if self.action_states.state_id == self.MOVE_STATE:
+                self.action_states.on_event(c.IDLE)
             self.pos.x = other_collider.pos.x + other_collider.rect.w
             self.vel.x = 0
         elif dy > 0:
-            if self.current_action_state == 'No_Jump_State':
-                self.action_states.on_event('idle')
+            if self.action_states.state_id == self.NO_JUMP_STATE:
+                self.action_states.on_event(c.IDLE)
             self.pos.y = other_collider.pos.y - self.rect.h
             self.vel.y = 0
         elif dy < 0:
             self.interact_with_tile(other_collider)
-            self.action_states.on_event('no jump')
+            self.action_states.on_event(c.NO_JUMP)
             self.pos.y = other_collider.pos.y + other_collider.rect.h
             self.vel.y = c.BOUNCE_VEL
 
     def check_entity_collisions(self):
         """Check for collisions with entities"""
-        entities = self.rect.check_entity_collisions(level.super_mushrooms + level.enemies)
+        entities = self.rect.check_entity_collisions(self.world.entity_sweep.get_candidates(self))
 
         for entity in entities:
             if entity.__class__.__name__ == 'Super_Mushroom' and entity.deployed:
-                self.mario_states.on_event('grow')
+                self.mario_states.on_event(c.GROW)
                 entity.collected = True
 
-            if hasattr(entity, 'state_machine') and entity.state_machine.get_state() != 'Knocked_State':
-                if entity.state_machine.get_state() == 'Shell_State':
+            if hasattr(entity, 'state_machine') and entity.state_machine.state_id != entity.KNOCKED_STATE:
+                if entity.state_machine.state_id == entity.SHELL_STATE:
                     if self.pos.x + self.rect.w < entity.pos.x + entity.rect.w / 2:
-                        entity.vel.x = 0.5
+                        entity.vel.x = c.SHELL_VEL_X
                     elif self.pos.x + self.rect.w > entity.pos.x + entity.rect.w / 2:
-                        entity.vel.x = -0.5
+                        entity.vel.x = -c.SHELL_VEL_X
                     elif self.vel.x < 0:
-                        entity.vel.x = -0.5
+                        entity.vel.x = -c.SHELL_VEL_X
                     elif self.vel.x > 0:
-                        entity.vel.x = 0.5
+                        entity.vel.x = c.SHELL_VEL_X
                     else:
-                        entity.vel.x = random.choice([-0.5, 0.5])
-                    entity.state_machine.on_event('move shell')
+                        entity.vel.x = self.world.random.choice([-c.SHELL_VEL_X, c.SHELL_VEL_X])
+                    entity.state_machine.on_event(c.MOVE_SHELL)
 
-                elif self.pos.y + self.rect.h - self.vel.y * c.delta_time < entity.pos.y:
-                    if entity.state_machine.get_state() == 'Run_State':
+                elif self.pos.y + self.rect.h - self.vel.y * self.world.delta_time < entity.pos.y:
+                    if entity.state_machine.state_id == entity.RUN_STATE:
                         self.vel.y = c.STOMP_VEL
                         self.pos.y = entity.pos.y - self.rect.h
-                        entity.state_machine.on_event('squish')
+                        entity.state_machine.on_event(c.SQUISH)
                         return
                 else:
-                    if entity.state_machine.get_state() != 'Shell_State' and entity.can_kill:
-                        self.mario_states.on_event('shrink')
+                    if entity.state_machine.state_id != entity.SHELL_STATE and entity.can_kill:
+                        self.mario_states.on_event(c.SHRINK)
 
     def interact_with_tile(self, tile):
         """Interact with tile based on current mario state"""
-        if self.current_mario_state == 'Small_Mario':
-            tile.state_machine.on_event('bounce')
+        if self.mario_states.state_id == self.SMALL_MARIO:
+            tile.state_machine.on_event(c.BOUNCE)
             if tile.__class__.__name__ == 'Brick':
                 sounds.bump.play()
-        elif self.current_mario_state == 'Big_Mario':
-            tile.state_machine.on_event('break')
+        elif self.mario_states.state_id == self.BIG_MARIO:
+            tile.state_machine.on_event(c.BREAK)
             if tile.__class__.__name__ == 'Question':
-                tile.state_machine.on_event('bounce')
+                tile.state_machine.on_event(c.BOUNCE)
 
     class Animation():
         """Contains specific animation variables and functions for this class"""
-        def __init__(self):
+        def __init__(self, world):
+            self.world = world
             self.current_sprite = sprites.SMALL_MARIO_IDLE
 
             self.mario_size = 'Small_Mario'
@@ -270,8 +298,8 @@ class Mario(Entity):
         def grow_anim(self):
             """Animation when growing"""
             self.current_sprite = sprites.GROW_SPRITES[self.grow_frames[self.anim_frame]]
-            self.anim_timer += c.delta_time
-            if self.anim_timer > 6 * c.delta_time:
+            self.anim_timer += self.world.delta_time
+            if self.anim_timer > 6 * self.world.delta_time:
                 self.anim_frame += 1
                 self.anim_timer = 0
             self.new_y = self.start_height - (self.current_sprite[3] - 48)
@@ -282,16 +310,16 @@ class Mario(Entity):
                 self.current_sprite = sprites.SMALL_MARIO_RUN[self.run_frames[self.anim_frame % 4]]
             else:
                 self.current_sprite = sprites.BIG_MARIO_RUN[self.run_frames[self.anim_frame % 4]]
-            self.anim_timer += c.delta_time
-            if self.anim_timer > 6 * c.delta_time:
+            self.anim_timer += self.world.delta_time
+            if self.anim_timer > 6 * self.world.delta_time:
                 self.anim_frame += 1
                 self.anim_timer = 0
 
         def shrink_anim(self):
             """Animation when shrinking"""
             self.current_sprite = sprites.SHRINK_SPRITES[self.shrink_frames[self.anim_frame]]
-            self.anim_timer += c.delta_time
-            if self.anim_timer > 6 * c.delta_time:
+            self.anim_timer += self.world.delta_time
+            if self.anim_timer > 6 * self.world.delta_time:
                 self.anim_frame += 1
                 self.anim_timer = 0
             self.new_y = self.start_height + (self.start_sprite_height - self.current_sprite[3])
@@ -302,8 +330,8 @@ class Mario(Entity):
                 self.current_sprite = sprites.WIN_SPRITES_SMALL[self.anim_frame % 2]
             else:
                 self.current_sprite = sprites.WIN_SPRITES_BIG[self.anim_frame % 2]
-            self.anim_timer += c.delta_time
-            if self.anim_timer > 8 * c.delta_time:
+            self.anim_timer += self.world.delta_time
+            if self.anim_timer > 8 * self.world.delta_time:
                 self.anim_frame += 1
                 self.anim_timer = 0
 
@@ -315,28 +343,11 @@ class Mario(Entity):
             else:
                 owner_object.animation.current_sprite = sprites.BIG_MARIO_IDLE
         
-        def on_event(self, event):
-            if event == 'jump':
-                return Mario.Jump_State()
-            elif event == 'move':
-                return Mario.Move_State()
-            elif event == 'decel':
-                return Mario.Decel_State()
-            elif event == 'brake':
-                return Mario.Brake_State()
-            elif event == 'crouch':
-                return Mario.Crouch_State()
-            return self
 
     class Jump_State(State):
         """State when jumping when spacebar input affects velocity"""
-        def on_event(self, event):
-            if event == 'no jump':
-                return Mario.No_Jump_State()
-            return self
-
         def on_enter(self, owner_object):
-            if owner_object.current_mario_state == 'Small_Mario':
+            if owner_object.mario_states.state_id == Mario.SMALL_MARIO:
                 sounds.small_jump.play()
             else:
                 sounds.big_jump.play()
@@ -345,65 +356,25 @@ class Mario(Entity):
             owner_object.vel.y = c.JUMP_VELOCITY
             if (not owner_object.spacebar or 
                 owner_object.pos.y < owner_object.start_height - c.MAX_JUMP_HEIGHT):
-                owner_object.action_states.on_event('no jump')
+                owner_object.action_states.on_event(c.NO_JUMP)
         
     class No_Jump_State(State):
         """State when in mid air but spacebar input does not affect velocity"""
-        def on_event(self, event):
-            if event == 'idle':
-                return Mario.Idle_State()
-            elif event == 'decel':
-                return Mario.Decel_State()
-            elif event == 'brake':
-                return Mario.Brake_State()
-            elif event == 'move':
-                return Mario.Move_State()
-            return self
 
     class Move_State(State):
         """State when moving on the ground and not breaking or decelerating"""
-        def on_event(self, event):
-            if event == 'decel':
-                return Mario.Decel_State()
-            elif event == 'brake':
-                return Mario.Brake_State()
-            elif event == 'no jump':
-                return Mario.No_Jump_State()
-            elif event == 'jump':
-                return Mario.Jump_State()
-            elif event == 'crouch':
-                return Mario.Crouch_State()
-            elif event == 'idle':
-                return Mario.Idle_State()
-            return self
-
         def update(self, owner_object):
             if owner_object.pressed_left:
-                c.ACCELERATION = -c.MARIO_ACCELERATION
+                owner_object.world.acceleration = -c.MARIO_ACCELERATION
             elif owner_object.pressed_right:
-                c.ACCELERATION = c.MARIO_ACCELERATION
+                owner_object.world.acceleration = c.MARIO_ACCELERATION
             owner_object.animation.run_anim()
 
     class Brake_State(State):
         """State when input is opposite velocity"""
-        def on_event(self, event):
-            if event == 'move':
-                return Mario.Move_State()
-            elif event == 'decel':
-                return Mario.Decel_State()
-            elif event == 'no jump':
-                return Mario.No_Jump_State()
-            elif event == 'jump':
-                return Mario.Jump_State()
-            elif event == 'crouch':
-                return Mario.Crouch_State()
-            elif event == 'idle':
-                return Mario.Idle_State()
-            return self
-
         def on_enter(self, owner_object):
-            c.ACCELERATION = 0
-            c.FRICTION = c.BRAKE_FRICTION
+            owner_object.world.acceleration = 0
+            owner_object.world.friction = c.BRAKE_FRICTION
             if owner_object.animation.mario_size == 'Small_Mario':
                 owner_object.animation.current_sprite = sprites.SMALL_MARIO_BRAKE
             else:
@@ -411,75 +382,38 @@ class Mario(Entity):
 
     class Decel_State(State):
         """State when moving when there is no longer any input"""
-        def on_event(self, event):
-            if event == 'idle':
-                return Mario.Idle_State()
-            elif event == 'brake':
-                return Mario.Brake_State()
-            elif event == 'move':
-                return Mario.Move_State()
-            elif event == 'no jump':
-                return Mario.No_Jump_State()
-            elif event == 'jump':
-                return Mario.Jump_State()
-            elif event == 'crouch':
-                return Mario.Crouch_State()
-            return self
-
         def on_enter(self, owner_object):
-            c.ACCELERATION = 0
-            c.FRICTION = c.DECEL_FRICTION
+            owner_object.world.acceleration = 0
+            owner_object.world.friction = c.DECEL_FRICTION
 
         def update(self, owner_object):
             owner_object.animation.run_anim()
 
     class Invincible_Mario(State):
         """State after shrinking when mario is invincible"""
-        def __init__(self):
-            self.invincible_timer = 0
-            self.blink_timer = 0
-
-        def on_event(self, event):
-            if event == 'small mario':
-                return Mario.Small_Mario()
-            return self
+        def on_enter(self, owner_object):
+            owner_object.invincible_timer = 0
+            owner_object.blink_timer = 0
 
         def update(self, owner_object):
-            self.invincible_timer += c.delta_time
-            if self.invincible_timer > 40 * c.delta_time:
-                owner_object.mario_states.on_event('small mario')
+            owner_object.invincible_timer += owner_object.world.delta_time
+            if owner_object.invincible_timer > 40 * owner_object.world.delta_time:
+                owner_object.mario_states.on_event(c.SMALL_MARIO)
 
-            self.blink_timer += c.delta_time
-            if self.blink_timer > 7 * c.delta_time:
+            owner_object.blink_timer += owner_object.world.delta_time
+            if owner_object.blink_timer > 7 * owner_object.world.delta_time:
                 owner_object.animation.current_sprite = sprites.EMPTY_SPRITE
-                if self.blink_timer > 14 * c.delta_time:
-                    self.blink_timer = 0
+                if owner_object.blink_timer > 14 * owner_object.world.delta_time:
+                    owner_object.blink_timer = 0
 
         def on_exit(self, owner_object):
             owner_object.animation.reset_anim_vars()
 
     class Small_Mario(State):
         """State when mario is small"""
-        def on_event(self, event):
-            if event == 'grow':
-                return Mario.Grow_Mario()
-            elif event == 'shrink':
-                return Mario.Dead_Mario()
-            elif event == 'win':
-                return Mario.Win_State()
-            elif event == 'dead':
-                return Mario.Dead_Mario()
-            return self
-        
+
     class Grow_Mario(State):
         """State when mario is growing"""
-        def on_event(self, event):
-            if event == 'big mario':
-                return Mario.Big_Mario()
-            if event == 'shrink':
-                return Mario.Shrink_Mario()
-            return self
-
         def on_enter(self, owner_object):
             owner_object.animation.start_height = owner_object.pos.y
             owner_object.animation.reset_anim_vars()
@@ -489,7 +423,7 @@ class Mario(Entity):
             owner_object.animation.grow_anim()
             owner_object.pos.y = owner_object.animation.new_y
             if owner_object.animation.anim_frame > 7:
-                owner_object.mario_states.on_event('big mario')
+                owner_object.mario_states.on_event(c.BIG_MARIO)
 
         def on_exit(self, owner_object):
             owner_object.rect.h = 96
@@ -499,24 +433,9 @@ class Mario(Entity):
 
     class Big_Mario(State):
         """State when mario is big"""
-        def on_event(self, event):
-            if event == 'shrink':
-                return Mario.Shrink_Mario()
-            elif event == 'dead':
-                return Mario.Dead_Mario()
-            elif event == 'win':
-                return Mario.Win_State()
-            return self
 
     class Shrink_Mario(State):
         """State when mario is shrinking"""
-        def on_event(self, event):
-            if event == 'invincible':
-                return Mario.Invincible_Mario()
-            if event == 'grow mario':
-                return Mario.Grow_Mario()
-            return self
-
         def on_enter(self, owner_object):
             owner_object.animation.reset_anim_vars()
             owner_object.animation.start_height = owner_object.pos.y
@@ -528,7 +447,7 @@ class Mario(Entity):
             owner_object.animation.shrink_anim()
             owner_object.pos.y = owner_object.animation.new_y
             if owner_object.animation.anim_frame > 7:
-                owner_object.mario_states.on_event('invincible')
+                owner_object.mario_states.on_event(c.INVINCIBLE)
 
         def on_exit(self, owner_object):
             owner_object.rect.h = 48
@@ -538,28 +457,15 @@ class Mario(Entity):
 
     class Crouch_State(State):
         """State when mario is crouching"""
-        def on_event(self, event):
-            if event == 'brake':
-                return Mario.Brake_State()
-            elif event == 'jump':
-                return Mario.Jump_State()
-            elif event == 'decel':
-                return Mario.Decel_State()
-            elif event == 'move':
-                return Mario.Move_State()
-            elif event == 'idle':
-                return Mario.Idle_State()
-            return self
-
         def on_enter(self, owner_object):
-            c.FRICTION = c.BRAKE_FRICTION
-            c.ACCELERATION = 0
+            owner_object.world.friction = c.BRAKE_FRICTION
+            owner_object.world.acceleration = 0
             owner_object.animation.current_sprite = sprites.MARIO_CROUCH
             owner_object.pos.y += 30
             owner_object.rect.h = owner_object.animation.current_sprite[3]
 
         def update(self, owner_object):
-            c.ACCELERATION = 0
+            owner_object.world.acceleration = 0
             if owner_object.vel.x == 0:
                 if owner_object.pressed_left:
                     owner_object.flip_sprites = True
@@ -572,13 +478,8 @@ class Mario(Entity):
         
     class Dead_Mario(State):
         """State when mario is dead"""
-        def __init__(self):
-            self.death_timer = 0
-
-        def on_event(self, event):
-            return self
-
         def on_enter(self, owner_object):
+            owner_object.death_timer = 0
             owner_object.animation.current_sprite = sprites.DEAD_MARIO
             owner_object.vel.y = c.DEATH_VEL_Y
             owner_object.vel.x = 0
@@ -590,25 +491,20 @@ class Mario(Entity):
             pg.mixer.music.play()
 
         def update(self, owner_object):
-            self.death_timer += c.delta_time
-            if self.death_timer > 20 * c.delta_time:
+            owner_object.death_timer += owner_object.world.delta_time
+            if owner_object.death_timer > 20 * owner_object.world.delta_time:
                 accelerate(owner_object, 0, c.GRAVITY)
-                owner_object.pos += owner_object.vel * c.delta_time
+                owner_object.pos.add_scaled(owner_object.vel.x, owner_object.vel.y, owner_object.world.delta_time)
 
     class Win_State(State):
         """State when mario wins, runs and manages events related to the final win animation"""
-        def __init__(self):
-            self.animation_step = 0
-            self.timer = 0
-
-        def on_event(self, event):
-            return self
-
         def on_enter(self, owner_object):
+            owner_object.win_step = 0
+            owner_object.win_timer = 0
             owner_object.animation.reset_anim_vars()
             owner_object.animation.start_height = owner_object.pos.y
             owner_object.animation.new_y = owner_object.pos.y
-            owner_object.pos.x = c.flagpole.pos.x - 16
+            owner_object.pos.x = owner_object.world.flagpole.pos.x - 16
             owner_object.freeze_movement = True
             owner_object.freeze_input = True
             owner_object.vel = Vector2()
@@ -616,37 +512,65 @@ class Mario(Entity):
             sounds.flagpole_sound.play()
 
         def update(self, owner_object):
+            flagpole = owner_object.world.flagpole
 
-            if self.animation_step == 0:
+            if owner_object.win_step == 0:
                 owner_object.animation.win_anim_on_flag()
                 owner_object.pos.y += 4
-                if owner_object.pos.y > c.flagpole.pos.y + c.flagpole.rect.h - 100:
-                    self.animation_step = 1
+                if owner_object.pos.y > flagpole.pos.y + flagpole.rect.h - 100:
+                    owner_object.win_step = 1
 
-            elif self.animation_step == 1:
-                owner_object.pos.x = c.flagpole.pos.x + 24
+            elif owner_object.win_step == 1:
+                owner_object.pos.x = flagpole.pos.x + 24
                 owner_object.flip_sprites = True
-                self.timer += c.delta_time
-                if self.timer > 20 * c.delta_time:
+                owner_object.win_timer += owner_object.world.delta_time
+                if owner_object.win_timer > 20 * owner_object.world.delta_time:
                     owner_object.flip_sprites = False
                     owner_object.freeze_movement = False
-                    owner_object.pos.x = c.flagpole.pos.x + c.flagpole.rect.w
-                    self.animation_step = 2
+                    owner_object.pos.x = flagpole.pos.x + flagpole.rect.w
+                    owner_object.win_step = 2
                     pg.mixer.music.set_endevent(c.WIN_SONG_END)
                     pg.mixer.music.load(sounds.stage_clear)
                     pg.mixer.music.play()
 
-            elif self.animation_step == 2:
-                c.ACCELERATION = c.MARIO_ACCELERATION
+            elif owner_object.win_step == 2:
+                owner_object.world.acceleration = c.MARIO_ACCELERATION
                 owner_object.pressed_right = True
-                if owner_object.pos.x > c.LEVEL_END_X:
+                if owner_object.pos.x > owner_object.world.level_end_x:
                     owner_object.freeze_movement = True
-                    c.final_count_down = True
-
-            
-            
-            
-
-
-
-        
\ No newline at end of file
+                    owner_object.world.final_count_down = True
+
+    #Transitions of action_states and mario_states
+    action_table = State_Table({IDLE_STATE: Idle_State, JUMP_STATE: Jump_State, NO_JUMP_STATE: No_Jump_State,
+                                MOVE_STATE: Move_State, BRAKE_STATE: Brake_State, DECEL_STATE: Decel_State,
+                                CROUCH_STATE: Crouch_State},
+                               {IDLE_STATE: {c.JUMP: JUMP_STATE, c.MOVE: MOVE_STATE, c.DECEL: DECEL_STATE,
+                                             c.BRAKE: BRAKE_STATE, c.CROUCH: CROUCH_STATE},
+                                JUMP_STATE: {c.NO_JUMP: NO_JUMP_STATE},
+                                NO_JUMP_STATE: {c.IDLE: IDLE_STATE, c.DECEL: DECEL_STATE, c.BRAKE: BRAKE_STATE,
+                                                c.MOVE: MOVE_STATE},
+                                MOVE_STATE: {c.DECEL: DECEL_STATE, c.BRAKE: BRAKE_STATE, c.NO_JUMP: NO_JUMP_STATE,
+                                             c.JUMP: JUMP_STATE, c.CROUCH: CROUCH_STATE, c.IDLE: IDLE_STATE},
+                                BRAKE_STATE: {c.MOVE: MOVE_STATE, c.DECEL: DECEL_STATE, c.NO_JUMP: NO_JUMP_STATE,
+                                              c.JUMP: JUMP_STATE, c.CROUCH: CROUCH_STATE, c.IDLE: IDLE_STATE},
+                                DECEL_STATE: {c.IDLE: IDLE_STATE, c.BRAKE: BRAKE_STATE, c.MOVE: MOVE_STATE,
+                                              c.NO_JUMP: NO_JUMP_STATE, c.JUMP: JUMP_STATE, c.CROUCH: CROUCH_STATE},
+                                CROUCH_STATE: {c.BRAKE: BRAKE_STATE, c.JUMP: JUMP_STATE, c.DECEL: DECEL_STATE,
+                                               c.MOVE: MOVE_STATE, c.IDLE: IDLE_STATE}},
+                               c.EVENT_COUNT)
+
+    mario_table = State_Table({SMALL_MARIO: Small_Mario, GROW_MARIO: Grow_Mario, BIG_MARIO: Big_Mario,
+                               SHRINK_MARIO: Shrink_Mario, INVINCIBLE_MARIO: Invincible_Mario,
+                               DEAD_MARIO: Dead_Mario, WIN_STATE: Win_State},
+                              {SMALL_MARIO: {c.GROW: GROW_MARIO, c.SHRINK: DEAD_MARIO, c.WIN: WIN_STATE,
+                                             c.DEAD: DEAD_MARIO},
+                               GROW_MARIO: {c.BIG_MARIO: BIG_MARIO, c.SHRINK: SHRINK_MARIO},
+                               BIG_MARIO: {c.SHRINK: SHRINK_MARIO, c.DEAD: DEAD_MARIO, c.WIN: WIN_STATE},
+                               SHRINK_MARIO: {c.INVINCIBLE: INVINCIBLE_MARIO},
+                               INVINCIBLE_MARIO: {c.SMALL_MARIO: SMALL_MARIO}},
+                              c.EVENT_COUNT)
+
+    #Groups of action states, indexed by state id
+    ON_GROUND = action_table.get_mask(MOVE_STATE, DECEL_STATE, BRAKE_STATE, IDLE_STATE)
+    SLOWING_DOWN = action_table.get_mask(DECEL_STATE, BRAKE_STATE, CROUCH_STATE)
+    IN_AIR = action_table.get_mask(JUMP_STATE, NO_JUMP_STATE)
@@ -1,35 +1,47 @@
 from .. import config as c
-from ..basetypes import Vector2, Game_Object, State_Machine, State, Entity, Rectangle
+from ..basetypes import Vector2, Game_Object, State_Machine, State_Table, State, Entity, Rectangle
 from .. import sprites
 from .. import sounds
-from ..utils import accelerate
-from .. import level
+from ..utils import accelerate, get_attributes, set_attributes
 import pygame as pg
 
 
 class Collider_Rect(Game_Object):
     """Class for static colliders"""
-    def __init__(self, rect):
-        super(Collider_Rect, self).__init__(rect)
+    def __init__(self, world, rect):
+        super(Collider_Rect, self).__init__(world, rect)
 
 class Question(Game_Object):
     """Question Block"""
-    def __init__(self, rect, contents):
-        super(Question, self).__init__(rect)
+    CLOSED_STATE, BOUNCE_STATE, OPEN_STATE = range(3)
+
+    def __init__(self, world, rect, contents):
+        super(Question, self).__init__(world, rect)
         self.contents = contents
 
-        self.animation = self.Animation(self.pos.y)
-        self.state_machine = State_Machine(self.Closed_State(), self)
+        self.animation = self.Animation(world, self.pos.y)
+        self.state_machine = State_Machine(self.state_table, self.CLOSED_STATE, self)
+        self.world.scheduler.activate('tiles', self) #Animates until opened
 
     def update(self):
         self.state_machine.update()
 
+    def get_snapshot(self):
+        return super(Question, self).get_snapshot() + (get_attributes(self.animation), self.state_machine.get_snapshot())
+
+    def restore_snapshot(self, snapshot):
+        super(Question, self).restore_snapshot(snapshot)
+        animation, state = snapshot[-2:]
+        set_attributes(self.animation, animation)
+        self.state_machine.restore_snapshot(state)
+
     def draw(self, pos):
-        c.screen.blit(sprites.tile_set, (pos.x, pos.y), self.animation.current_sprite)
+        self.world.screen.blit(sprites.images[self.animation.current_sprite], (pos.x, pos.y))
 
     class Animation():
         """Contains specific animation variables and functions for this class"""
-        def __init__(self, start_height):
+        def __init__(self, world, start_height):
+            self.world = world
             self.current_sprite = sprites.Q_BLOCK_CLOSED[0]
 
             self.outer_timer = c.INITIAL_TIMER_VALUE
@@ -44,10 +56,10 @@ class Question(Game_Object):
         def closed_anim(self):
             """Animation when not opened"""
             self.current_sprite = sprites.Q_BLOCK_CLOSED[self.closed_frames[self.closed_frame]]
-            self.outer_timer += c.delta_time
-            if self.outer_timer > 20 * c.delta_time:
-                self.inner_timer += c.delta_time
-                if self.inner_timer > 6 * c.delta_time:
+            self.outer_timer += self.world.delta_time
+            if self.outer_timer > 20 * self.world.delta_time:
+                self.inner_timer += self.world.delta_time
+                if self.inner_timer > 6 * self.world.delta_time:
                     self.closed_frame += 1
                     self.inner_timer = 0
 
@@ -66,27 +78,17 @@ class Question(Game_Object):
 
     class Closed_State(State):
         """State when not opened yet"""
-        def on_event(self, event):
-            if event == 'bounce':
-                return Question.Bounce_State()
-            return self
-
         def update(self, owner_object):
             owner_object.animation.closed_anim()
 
     class Bounce_State(State):
         """State when opening"""
-        def on_event(self, event):
-            if event == 'open':
-                return Question.Open_State()
-            return self
-
         def on_enter(self, owner_object):
             owner_object.animation.current_sprite = sprites.Q_BLOCK_OPEN
             if owner_object.contents.__class__.__name__ == 'Coin':
-                owner_object.contents.deployed = True
-                c.total_score += c.COIN_SCORE
-                c.collected_coins += 1
+                owner_object.contents.deploy()
+                owner_object.world.total_score += c.COIN_SCORE
+                owner_object.world.collected_coins += 1
                 sounds.coin.play()
             else:
                 sounds.powerup_appears.play()
@@ -94,39 +96,59 @@ class Question(Game_Object):
         def update(self, owner_object):
             owner_object.animation.bounce_anim()
             owner_object.pos.y = owner_object.animation.new_y
+            owner_object.world.collision_world.move(owner_object)
             if owner_object.animation.bounce_iteration > 48:
-                owner_object.state_machine.on_event('open')
+                owner_object.state_machine.on_event(c.OPEN)
 
     class Open_State(State):
         """State when opened"""
-        def on_event(self, event):
-            return self
-        
         def on_enter(self, owner_object):
-            owner_object.contents.deployed = True
+            owner_object.contents.deploy()
+            owner_object.world.scheduler.deactivate('tiles', owner_object)
+
+    state_table = State_Table({CLOSED_STATE: Closed_State, BOUNCE_STATE: Bounce_State, OPEN_STATE: Open_State},
+                              {CLOSED_STATE: {c.BOUNCE: BOUNCE_STATE},
+                               BOUNCE_STATE: {c.OPEN: OPEN_STATE}},
+                              c.EVENT_COUNT)
+
+    #States in which the block knocks enemies standing on it, indexed by state id
+    KNOCKING = state_table.get_mask(BOUNCE_STATE)
 
 class Brick(Game_Object):
     """Brick class"""
-    def __init__(self, rect):
-        super(Brick, self).__init__(rect)
+    IDLE_STATE, BOUNCE_STATE, BREAK_STATE = range(3)
+
+    def __init__(self, world, rect):
+        super(Brick, self).__init__(world, rect)
 
         self.animation = self.Animation(self.pos.y)
-        self.state_machine = State_Machine(self.Idle_State(), self)
+        self.state_machine = State_Machine(self.state_table, self.IDLE_STATE, self)
 
         self.remove = False
+        self.wait_for_frame = 0 #Frames since breaking, the collider is removed the frame after
     
     def update(self):
         self.state_machine.update()
 
+    def get_snapshot(self):
+        return super(Brick, self).get_snapshot() + (self.remove, self.wait_for_frame, get_attributes(self.animation),
+                                                      self.state_machine.get_snapshot())
+
+    def restore_snapshot(self, snapshot):
+        super(Brick, self).restore_snapshot(snapshot)
+        self.remove, self.wait_for_frame, animation, state = snapshot[-4:]
+        set_attributes(self.animation, animation)
+        self.state_machine.restore_snapshot(state)
+
     def draw(self, pos):
-        c.screen.blit(sprites.tile_set, (pos.x, pos.y), sprites.BRICK)
+        self.world.screen.blit(sprites.images[sprites.BRICK], (pos.x, pos.y))
 
     def instantiate_fragments(self):
         """Instantiate fragments when broken"""
-        level.brick_fragments.append(Brick_Fragment(Vector2(self.pos.x, self.pos.y), Vector2(-0.1, -0.5), Rectangle()))
-        level.brick_fragments.append(Brick_Fragment(Vector2(self.pos.x + 24, self.pos.y), Vector2(0.1, -0.5), Rectangle()))
-        level.brick_fragments.append(Brick_Fragment(Vector2(self.pos.x + 24, self.pos.y + 24), Vector2(0.1, -0.4), Rectangle()))
-        level.brick_fragments.append(Brick_Fragment(Vector2(self.pos.x, self.pos.y + 24), Vector2(-0.1, -0.4), Rectangle()))
+        for offset_x, offset_y, vel_x, vel_y in [(0, 0, -0.1, -0.5), (24, 0, 0.1, -0.5), (24, 24, 0.1, -0.4), (0, 24, -0.1, -0.4)]:
+            fragment = self.world.fragment_pool.acquire()
+            fragment.spawn(self.pos.x + offset_x, self.pos.y + offset_y, vel_x, vel_y)
+            self.world.brick_fragments.append(fragment)
 
     class Animation():
         """Contains specific animation variables and functions for this class"""
@@ -145,91 +167,118 @@ class Brick(Game_Object):
 
     class Idle_State(State):
         """State when not interacting with anything"""
-        def on_event(self, event):
-            if event == 'bounce':
-                return Brick.Bounce_State()
-            elif event == 'break':
-                return Brick.Break_State()
-            return self
+        def on_enter(self, owner_object):
+            owner_object.world.scheduler.deactivate('tiles', owner_object)
 
     class Bounce_State(State):
         """State when small mario hits brick from under"""
-        def on_event(self, event):
-            if event == 'idle':
-                return Brick.Idle_State()
-            return self
+        def on_enter(self, owner_object):
+            owner_object.world.scheduler.activate('tiles', owner_object)
         
         def update(self, owner_object):
             owner_object.animation.bounce_anim()
             owner_object.pos.y = owner_object.animation.new_y
+            owner_object.world.collision_world.move(owner_object)
             if owner_object.animation.bounce_iteration > 48:
                 owner_object.animation.bounce_iteration = 0
-                owner_object.state_machine.on_event('idle')
+                owner_object.state_machine.on_event(c.IDLE)
 
     class Break_State(State):
         """State when big mario hits brick from under"""
-        def __init__(self):
-            self.wait_for_frame = 0
-
         def on_enter(self, owner_object):
+            owner_object.wait_for_frame = 0
             owner_object.instantiate_fragments()
             sounds.brick_smash.play()
+            owner_object.world.scheduler.activate('tiles', owner_object)
 
         def update(self, owner_object):
-            if self.wait_for_frame > 0:
-                level.dynamic_colliders.remove(owner_object)
-            self.wait_for_frame += 1
+            if owner_object.wait_for_frame > 0:
+                owner_object.world.collision_world.remove(owner_object)
+                owner_object.world.scheduler.deactivate('tiles', owner_object)
+            owner_object.wait_for_frame += 1
+
+    state_table = State_Table({IDLE_STATE: Idle_State, BOUNCE_STATE: Bounce_State, BREAK_STATE: Break_State},
+                              {IDLE_STATE: {c.BOUNCE: BOUNCE_STATE, c.BREAK: BREAK_STATE},
+                               BOUNCE_STATE: {c.IDLE: IDLE_STATE}},
+                              c.EVENT_COUNT)
+
+    #States in which the brick knocks enemies standing on it, indexed by state id
+    KNOCKING = state_table.get_mask(BOUNCE_STATE, BREAK_STATE)
 
 class Brick_Fragment(Entity):
-    """Handles individual brick fragments and their animations"""
-    def __init__(self, pos, vel, rect):
-        super(Brick_Fragment, self).__init__(vel, rect)
-        self.rect.pos = pos
-        self.animation = self.Animation()
+    """Handles individual brick fragments and their animations, instances are reused through the fragment pool of the world"""
+    def __init__(self, world):
+        super(Brick_Fragment, self).__init__(world, Vector2(), Rectangle())
+        self.animation = self.Animation(world)
+
+    def spawn(self, x, y, vel_x, vel_y):
+        """Reset the fragment to a new position and velocity"""
+        self.pos.x = x
+        self.pos.y = y
+        self.vel.x = vel_x
+        self.vel.y = vel_y
+        self.animation.reset()
 
     def update(self):
         accelerate(self, 0, c.GRAVITY)
-        self.pos += self.vel * c.delta_time
+        self.pos.add_scaled(self.vel.x, self.vel.y, self.world.delta_time)
         self.animation.anim()
         self.check_for_destroy()
     
     def check_for_destroy(self):
         """Checks if instance can be destroyed"""
         if self.pos.y > c.SCREEN_SIZE.y:
-            level.brick_fragments.remove(self)
+            self.world.destroy(self.world.brick_fragments, self, self.world.fragment_pool)
+
+    def get_snapshot(self):
+        return super(Brick_Fragment, self).get_snapshot() + (get_attributes(self.animation),)
+
+    def restore_snapshot(self, snapshot):
+        super(Brick_Fragment, self).restore_snapshot(snapshot)
+        set_attributes(self.animation, snapshot[-1])
     
     def draw(self):
-        view_pos = c.camera.to_view_space(self.pos)
-        c.screen.blit(sprites.tile_set, (view_pos.x, view_pos.y), self.animation.current_sprite)
+        view_pos = self.world.camera.to_view_space(self.pos)
+        self.world.screen.blit(sprites.images[self.animation.current_sprite], (view_pos.x, view_pos.y))
     
     class Animation():
         """Contains specific animation variables and functions for this class"""
-        def __init__(self):
+        def __init__(self, world):
+            self.world = world
+            self.reset()
+
+        def reset(self):
             self.current_sprite = None
             self.anim_frame = 0
             self.anim_timer = c.INITIAL_TIMER_VALUE
 
         def anim(self):
             self.current_sprite = sprites.BRICK_FRAGMENT[self.anim_frame % 2]
-            self.anim_timer += c.delta_time
-            if self.anim_timer > 8 * c.delta_time:
+            self.anim_timer += self.world.delta_time
+            if self.anim_timer > 8 * self.world.delta_time:
                 self.anim_frame += 1
                 self.anim_timer = 0
 
 class Flagpole(Game_Object):
     """Handles flagpole at the end of level and triggers win events"""
-    def __init__(self, rect, flag_pos):
-        super(Flagpole, self).__init__(rect)
+    def __init__(self, world, rect, flag_pos):
+        super(Flagpole, self).__init__(world, rect)
         self.flag_pos = flag_pos
 
     def update(self):
-        if self.rect.check_collisions([c.mario]) is not None:
-            c.mario.mario_states.on_event('win')
+        if self.rect.check_collisions([self.world.mario]) is not None:
+            self.world.mario.mario_states.on_event(c.WIN)
 
-        if c.mario.current_mario_state == 'Win_State':
+        if self.world.mario.current_mario_state == self.world.mario.WIN_STATE:
             if not self.flag_pos.y >= self.pos.y + self.rect.h - 60:
                 self.flag_pos.y += 4
 
+    def get_snapshot(self):
+        return (self.flag_pos.x, self.flag_pos.y)
+
+    def restore_snapshot(self, snapshot):
+        self.flag_pos.x, self.flag_pos.y = snapshot
+
     def draw_flag(self):
-        view_pos = c.camera.to_view_space(self.flag_pos)
-        c.screen.blit(sprites.tile_set, (view_pos.x, view_pos.y), sprites.FLAG)
+        view_pos = self.world.camera.to_view_space(self.flag_pos)
+        self.world.screen.blit(sprites.images[sprites.FLAG], (view_pos.x, view_pos.y))
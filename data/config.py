@@ -1,14 +1,9 @@
 from .basetypes import Vector2
 import pygame as pg
 
-#Variables shared among different basetypes
+#Window and clock of the app, the state of a game is owned by its World, see world.py
 screen = None
 clock = None
-camera = None
-keys = None
-delta_time = None
-mario = None
-final_count_down = False
 
 #Colors for level loading
 BLACK = (0, 0, 0, 255)
@@ -28,17 +23,29 @@ CAPTION = 'Mario Bros'
 
 #Start positions
 MARIO_START_POSITION = Vector2(138, 552)
-FOREGROUND_POS = Vector2(9840, 505)
 
 TILE_SIZE = 48
+TILE_OFFSET_Y = 24 #Tiles of the level are placed this far below the tile grid
+
+#Level streaming, objects of a chunk are created when it is less than CHUNK_LOAD_DISTANCE right of the screen
+#or of an active enemy or item, whichever is further right
+CHUNK_WIDTH = 16 * TILE_SIZE
+CHUNK_LOAD_DISTANCE = 4 * TILE_SIZE
+
+#Fewer movers than this are moved and swept through the tile grid one by one instead of in one NumPy batch
+SWEEP_BATCH_MIN = 16
+
+#Simulation runs in steps of TIME_STEP ms, rendering as often as FRAME_RATE_LIMIT allows
+#0 = no limit, which keeps a whole core busy drawing, --uncapped sets that
+TIME_STEP = 1000 / 60
+FRAME_RATE_LIMIT = 60
+MAX_FRAME_TIME = 250 #Longer frames are cut off, so a stall doesn't cause a burst of catch up steps
 
 #Physics values
-ACCELERATION = 0
 MARIO_ACCELERATION = 0.0005
 MAX_VEL = 0.35
 GRAVITY = 0.002
 MAX_JUMP_HEIGHT = 140
-FRICTION = 1
 DECEL_FRICTION = 0.95
 BRAKE_FRICTION = 0.85
 
@@ -47,14 +54,11 @@ BOUNCE_VEL = 0.1
 JUMP_VELOCITY = -0.5
 MUSHROOM_START_VEL_X = 0.2
 ENEMY_START_VEL_X = -0.1
+SHELL_VEL_X = 0.5
 STOMP_VEL = -0.4
 DEATH_VEL_Y = -0.8
 GOOMBA_KNOCKED_VEL_Y = -0.8
 
-#End of level settings
-MAXIMUM_CAMERA_SCROLL = 9300
-LEVEL_END_X = 9840
-
 #Distance from left side of the screen, when camera starts following
 CAMERA_FOLLOW_X = 300
 
@@ -62,8 +66,6 @@ CAMERA_FOLLOW_X = 300
 INITIAL_TIMER_VALUE = 1000
 
 #Score values
-collected_coins = 0
-total_score = 0
 COIN_SCORE = 200
 MUSHROOM_SCORE = 1000
 GOOMBA_SCORE = 100
@@ -74,11 +76,7 @@ WIN_SONG_END = pg.USEREVENT + 1
 DEATH_SONG_END = pg.USEREVENT + 2
 OUT_OF_TIME_END = pg.USEREVENT + 3
 
-
-
-
-
-
-
-
-
+#Events sent to state machines, ids of the columns of a State_Table
+(JUMP, NO_JUMP, MOVE, DECEL, BRAKE, IDLE, CROUCH, GROW, SHRINK, BIG_MARIO, SMALL_MARIO, INVINCIBLE,
+ WIN, DEAD, KNOCKED, SQUISH, MOVE_SHELL, BOUNCE, OPEN, BREAK) = range(20)
+EVENT_COUNT = 20
@@ -0,0 +1,271 @@
+from . import config as c
+from .headless import Headless_Game
+import multiprocessing
+
+try:
+    from multiprocessing import shared_memory
+except ImportError: #Python 3.7, workers get shared ctypes arrays instead, see Vector_Env
+    shared_memory = None
+import pygame as pg
+import numpy as np
+import math
+
+#Keys that are held for each action, built from the keys Mario.update reads
+ACTIONS = [
+    (),
+    (pg.K_d,),
+    (pg.K_d, pg.K_SPACE),
+    (pg.K_a,),
+    (pg.K_a, pg.K_SPACE),
+    (pg.K_SPACE,),
+    (pg.K_s,),
+]
+
+#Observation: mario x, mario y, mario velocity x and y, camera x, score, time left, 1 if mario is big, 1 if he is in the air
+OBSERVATION_SIZE = 9
+
+#Codes of the cells of the grid observation
+EMPTY = 0
+SOLID = 1 #Ground, pipes and opened question blocks
+BRICK = 2
+QUESTION = 3
+ENEMY = 4
+ITEM = 5
+
+#The grid covers the height of the level and GRID_COLUMNS tiles starting GRID_BEHIND tiles left of mario
+GRID_ROWS = math.ceil((c.SCREEN_SIZE.y - c.TILE_OFFSET_Y) / c.TILE_SIZE)
+GRID_COLUMNS = 16
+GRID_BEHIND = 4
+
+#Reward per pixel of new progress to the right and per point of score
+PROGRESS_REWARD = 0.01
+SCORE_REWARD = 0.001
+
+def get_tile_code(collider, tiles):
+    """Returns the cell code of a collider, tiles is the module with the tile classes"""
+    if isinstance(collider, tiles.Brick):
+        return BRICK
+    if isinstance(collider, tiles.Question) and collider.state_machine.state_id == collider.CLOSED_STATE:
+        return QUESTION
+    return SOLID
+
+def fill_cells(grid, left, x, y, w, h, code):
+    """Sets the cells a box covers to code, edges are rounded to the nearest cell so bouncing tiles stay in their cell"""
+    column_start = max(round(x / c.TILE_SIZE) - left, 0)
+    column_end = min(round((x + w) / c.TILE_SIZE) - left, GRID_COLUMNS)
+    row_start = max(round((y - c.TILE_OFFSET_Y) / c.TILE_SIZE), 0)
+    row_end = min(round((y + h - c.TILE_OFFSET_Y) / c.TILE_SIZE), GRID_ROWS)
+    if column_start < column_end and row_start < row_end:
+        grid[row_start:row_end, column_start:column_end] = code
+
+def get_grid(world, out = None):
+    """Returns the tiles, enemies and items around mario as cell codes on the tile lattice, rows are the y axis
+
+    Built from the box arrays of the collision world and the enemy list, nothing gets drawn.
+    """
+    #Loading the tiles loads sounds, which needs the mixer, so they can only be imported once a game exists
+    from .components import tiles
+
+    if out is None:
+        out = np.zeros((GRID_ROWS, GRID_COLUMNS), dtype = np.uint8)
+    out[:] = EMPTY
+    left = math.floor(world.mario.pos.x / c.TILE_SIZE) - GRID_BEHIND
+    start_x = left * c.TILE_SIZE
+    end_x = start_x + GRID_COLUMNS * c.TILE_SIZE
+
+    #Dynamic tiles are filled in after the static colliders
+    collision_world = world.collision_world
+    count = len(collision_world.box_colliders)
+    boxes = collision_world.boxes[:count]
+    visible = np.flatnonzero((boxes[:, 0] + boxes[:, 2] > start_x) & (boxes[:, 0] < end_x))
+    visible = visible[np.argsort(collision_world.box_dynamic[visible], kind = 'stable')]
+    for i in visible.tolist():
+        x, y, w, h = boxes[i].tolist()
+        fill_cells(out, left, x, y, w, h, get_tile_code(collision_world.box_colliders[i], tiles))
+
+    for item in world.super_mushrooms:
+        if item.deployed:
+            fill_cells(out, left, item.pos.x, item.pos.y, item.rect.w, item.rect.h, ITEM)
+
+    #Enemies take the cell of their center, knocked and squished ones are left out
+    for enemy in world.enemies:
+        if enemy.collides and enemy.rect.w > 0:
+            column = math.floor((enemy.pos.x + enemy.rect.w / 2) / c.TILE_SIZE) - left
+            row = math.floor((enemy.pos.y + enemy.rect.h / 2 - c.TILE_OFFSET_Y) / c.TILE_SIZE)
+            if 0 <= column < GRID_COLUMNS and 0 <= row < GRID_ROWS:
+                out[row, column] = ENEMY
+    return out
+
+class Mario_Env():
+    """Reinforcement learning environment with reset and step like a gym environment
+
+    Every step holds the keys of an action for frame_skip frames. Each environment has its own World,
+    see Vector_Env for running several of them in parallel. With grid, observations are dicts with
+    the vector as 'mario' and the cells around mario as 'grid', see get_grid.
+    """
+    def __init__(self, frame_skip = 4, stage = 0, grid = False):
+        self.frame_skip = frame_skip
+        self.stage = stage
+        self.grid = grid
+        self.action_count = len(ACTIONS)
+        self.observation_size = OBSERVATION_SIZE
+        self.game = Headless_Game()
+        self.max_x = 0
+        self.score = 0
+
+    def reset(self):
+        """Start a new game, returns the first observation"""
+        self.game.reset(self.stage)
+        self.max_x = self.game.main.world.mario.pos.x
+        self.score = self.game.main.world.total_score
+        return self.observe()
+
+    def step(self, action):
+        """Returns observation, reward, done and an info dict"""
+        frames = self.game.step(ACTIONS[action], self.frame_skip)
+        world = self.game.main.world
+
+        #Only getting further than ever before counts, so walking back and forth isn't rewarded
+        progress = max(world.mario.pos.x - self.max_x, 0)
+        self.max_x += progress
+        reward = progress * PROGRESS_REWARD + (world.total_score - self.score) * SCORE_REWARD
+        self.score = world.total_score
+
+        info = {'frames': frames, 'x': world.mario.pos.x, 'score': world.total_score}
+        return self.observe(), reward, self.game.is_done(), info
+
+    def observe(self):
+        if self.grid:
+            return {'mario': self.get_observation(), 'grid': self.get_grid()}
+        return self.get_observation()
+
+    def get_grid(self, out = None):
+        return get_grid(self.game.main.world, out)
+
+    def get_observation(self, out = None):
+        """Writes the observation into out if given, so vector environments can fill shared memory directly"""
+        if out is None:
+            out = np.zeros(OBSERVATION_SIZE, dtype = np.float32)
+        world = self.game.main.world
+        mario = world.mario
+        out[:] = (mario.pos.x, mario.pos.y, mario.vel.x, mario.vel.y,
+                  world.camera.pos.x, world.total_score, self.game.main.time.total_value,
+                  mario.animation.mario_size == 'Big_Mario',
+                  mario.IN_AIR[mario.current_action_state])
+        return out
+
+def run_worker(index, connection, blocks, count, frame_skip, stage):
+    """Runs one Mario_Env in a worker process and writes its results into row index of the shared buffers
+
+    blocks are the names of shared memory blocks, or shared ctypes arrays where there is no shared memory.
+    """
+    memories = []
+    if isinstance(blocks[0], str):
+        memories = [shared_memory.SharedMemory(name = name) for name in blocks]
+        blocks = [memory.buf for memory in memories]
+    observations, rewards, dones, grids = get_buffers(blocks, count)
+    env = Mario_Env(frame_skip, stage)
+
+    try:
+        while True:
+            command = connection.recv()
+            if command is None:
+                break
+
+            #Finished games start over right away, like most vector environments do
+            if command == 'reset':
+                env.reset()
+                rewards[index] = 0
+                dones[index] = False
+            else:
+                observation, rewards[index], dones[index], info = env.step(command)
+                if dones[index]:
+                    env.reset()
+            env.get_observation(observations[index])
+            if grids is not None:
+                env.get_grid(grids[index])
+            connection.send(None)
+    finally:
+        del observations, rewards, dones, grids
+        for memory in memories:
+            memory.close()
+
+def get_buffers(blocks, count):
+    """Returns arrays for observations, rewards, dones and grids on top of shared buffers, grids is None without a fourth buffer"""
+    grids = None
+    if len(blocks) > 3:
+        grids = np.ndarray((count, GRID_ROWS, GRID_COLUMNS), dtype = np.uint8, buffer = blocks[3])
+    return (np.ndarray((count, OBSERVATION_SIZE), dtype = np.float32, buffer = blocks[0]),
+            np.ndarray(count, dtype = np.float32, buffer = blocks[1]),
+            np.ndarray(count, dtype = bool, buffer = blocks[2]),
+            grids)
+
+class Vector_Env():
+    """Runs count environments in worker processes, observations come back through shared memory instead of pipes
+
+    step takes one action per environment and returns arrays with a row per environment. The arrays are
+    views on the shared memory and get overwritten by the next call, copy them to keep them. With grid,
+    observations are dicts of arrays like the ones of Mario_Env.
+    """
+    def __init__(self, count, frame_skip = 4, stage = 0, grid = False):
+        self.count = count
+        self.action_count = len(ACTIONS)
+        self.observation_size = OBSERVATION_SIZE
+
+        #Spawned workers start from a clean interpreter, forking would copy the pygame state of this process
+        context = multiprocessing.get_context('spawn')
+
+        sizes = [count * OBSERVATION_SIZE * 4, count * 4, count]
+        if grid:
+            sizes.append(count * GRID_ROWS * GRID_COLUMNS)
+        if shared_memory is not None:
+            self.memories = [shared_memory.SharedMemory(create = True, size = size) for size in sizes]
+            blocks = [memory.buf for memory in self.memories]
+            worker_blocks = [memory.name for memory in self.memories]
+        else:
+            #Shared ctypes arrays can only be handed to workers when starting them, which is all that is needed
+            self.memories = []
+            blocks = worker_blocks = [context.RawArray('B', size) for size in sizes]
+        self.observations, self.rewards, self.dones, self.grids = get_buffers(blocks, count)
+
+        self.connections = []
+        self.workers = []
+        for index in range(count):
+            connection, worker_connection = context.Pipe()
+            worker = context.Process(target = run_worker, daemon = True,
+                                     args = (index, worker_connection, worker_blocks, count, frame_skip, stage))
+            worker.start()
+            self.connections.append(connection)
+            self.workers.append(worker)
+
+    def send(self, commands):
+        for connection, command in zip(self.connections, commands):
+            connection.send(command)
+        for connection in self.connections:
+            connection.recv()
+
+    def reset(self):
+        """Start new games in all workers, returns the first observations"""
+        self.send(['reset'] * self.count)
+        return self.observe()
+
+    def step(self, actions):
+        """Returns observations, rewards and dones, environments that are done have been reset already"""
+        self.send([int(action) for action in actions])
+        return self.observe(), self.rewards, self.dones
+
+    def observe(self):
+        if self.grids is not None:
+            return {'mario': self.observations, 'grid': self.grids}
+        return self.observations
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(None)
+        for worker in self.workers:
+            worker.join()
+
+        del self.observations, self.rewards, self.dones, self.grids
+        for memory in self.memories:
+            memory.close()
+            memory.unlink()
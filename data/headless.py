@@ -0,0 +1,95 @@
+from . import config as c
+from . import sprites
+import pygame as pg
+import os
+
+class Key_State():
+    """Stands in for pg.key.get_pressed(), keys are pressed when they are in the given collection"""
+    def __init__(self, pressed = ()):
+        self.pressed = frozenset(pressed)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+class Headless_Game():
+    """Runs the game without window and audio, advanced by step instead of Main.main_loop"""
+    def __init__(self, draw = False, recorder = None):
+        #SDL only reads the drivers when the subsystems are initialized for the first time
+        if not pg.display.get_init():
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            os.environ['SDL_AUDIODRIVER'] = 'dummy'
+        pg.init()
+        if c.screen is None:
+            c.screen = pg.display.set_mode((c.SCREEN_SIZE.x, c.SCREEN_SIZE.y))
+        sprites.convert_images()
+
+        #Loading sounds needs the mixer, so main can only be imported after pg.init
+        from . import main
+        self.main_module = main
+
+        self.draw = draw
+        self.recorder = recorder #Records every step, started by reset
+        self.main = None
+        self.frame = 0
+
+    def reset(self, stage = 0):
+        """Start a new game at a stage, scores and the timer start over"""
+        if self.recorder is not None:
+            self.recorder.stage = stage
+        self.main = self.main_module.Main(recorder = self.recorder, stage = stage, draw = self.draw)
+        self.main.world.keys = Key_State()
+        self.frame = 0
+        pg.event.clear()
+
+    def step(self, inputs = (), n_frames = 1):
+        """Hold the keys in inputs for n_frames simulation steps, stops early when the game is done
+
+        Returns the number of steps that were run.
+        """
+        world = self.main.world
+        world.delta_time = c.TIME_STEP
+        world.keys = Key_State(inputs)
+        steps = 0
+        while steps < n_frames and not self.is_done():
+            self.run_frame()
+            steps += 1
+        self.frame += steps
+
+        #Events of songs ending arrive in real time, so they are dropped instead of piling up
+        pg.event.clear()
+        return steps
+
+    def run_frame(self):
+        self.main.step(interpolate = self.draw)
+        if self.draw:
+            self.main.draw()
+
+    def play(self, replay):
+        """Runs all frames of a replay as fast as possible, returns the number of frames"""
+        self.reset(replay.stage)
+        replay.start(self.main.world)
+        frames = 0
+        for keys, delta_time in replay.frames():
+            self.main.world.keys = keys
+            self.main.world.delta_time = delta_time
+            self.run_frame()
+            frames += 1
+        self.frame += frames
+        pg.event.clear()
+        return frames
+
+    def snapshot(self):
+        """Returns the state of the game as bytes, see Main.snapshot"""
+        return self.main.snapshot()
+
+    def restore(self, snapshot):
+        """Go back to a snapshot, it may have been taken by another Headless_Game"""
+        self.main.restore(snapshot)
+
+    def is_done(self):
+        """Checks if the game is over, main_loop would go back to the menu once the death or win song ends"""
+        world = self.main.world
+        state = world.mario.current_mario_state
+        if state == world.mario.DEAD_MARIO or world.mario.to_menu:
+            return True
+        return state == world.mario.WIN_STATE and world.final_count_down and self.main.time.total_value == 0
@@ -1,90 +1,192 @@
-from .sprites import level_1
 from .basetypes import Vector2, Rectangle
 from . import config as c
-from .components.tiles import Question, Brick, Collider_Rect, Flagpole
-from .components.items import *
-from .components.enemies import *
-
-#Colliders that don't possess velocity
-static_colliders = []
-
-#Colliders that possess velocity
-dynamic_colliders = []
-
-coins = []
-super_mushrooms = []
-enemies = []
-
-#Fragments go here when a brick tile gets broken
-brick_fragments = []
-
-#Start and End tile for grouping large rows of tiles into one collider
-start_tile = None
-end_tile = None
-
-#Read pixel data from level map and instantiate objects corresponding to pixel colors
-for y in range(0, level_1.size[1]):
-    for x in range(0, level_1.size[0]):
-
-        color = level_1.getpixel((x, y))
-        pos = Vector2(x * c.TILE_SIZE, y * c.TILE_SIZE + 24)
-
-        #Black = Static ground collider, which are grouped together for optimizations
-        if color == c.BLACK:
-            if start_tile == None:
-                start_tile = pos
-            if end_tile == None:
-                if x + 1 > level_1.size[0]:
-                    end_tile = pos
-                if level_1.getpixel((x + 1, y)) != c.BLACK:
-                    end_tile = pos
-            if end_tile != None and start_tile != None:
-                w = end_tile.x - start_tile.x + c.TILE_SIZE
-                h = c.TILE_SIZE
-                rect = Rectangle(start_tile, w, h)
-                static_colliders.append(Collider_Rect(rect))
-                end_tile = None
-                start_tile = None
-        
-        #Red = Pipe collider
-        elif color == c.RED:
-            h = c.SCREEN_SIZE.y - pos.y
-            w = 2 * c.TILE_SIZE
-            rect = Rectangle(pos, w, h)
-            static_colliders.append(Collider_Rect(rect))
-
-        #Yellow = Question tile with coin as item
-        elif color == c.YELLOW:
-            coin_rect = Rectangle(Vector2(pos.x, pos.y), 48, 42)
-            contents = Coin(coin_rect)
-            coins.append(contents)
-            rect = Rectangle(pos, c.TILE_SIZE, c.TILE_SIZE)
-            dynamic_colliders.append(Question(rect, contents))
-
-        #Gray = Brick tile
-        elif color == c.GRAY:
-            rect = Rectangle(pos, c.TILE_SIZE, c.TILE_SIZE)
-            dynamic_colliders.append(Brick(rect))
-
-        #Green = Question tile with mushroom as item
-        elif color == c.GREEN:
-            mushroom_rect = Rectangle(Vector2(pos.x, pos.y), c.TILE_SIZE, c.TILE_SIZE)
-            contents = Super_Mushroom(mushroom_rect, Vector2(c.MUSHROOM_START_VEL_X, 0))
-            super_mushrooms.append(contents)
-            rect = Rectangle(pos, c.TILE_SIZE, c.TILE_SIZE)
-            dynamic_colliders.append(Question(rect, contents))
-
-        #Brown = Goomba
-        elif color == c.BROWN:
-            rect = Rectangle(pos, c.TILE_SIZE, c.TILE_SIZE)
-            enemies.append(Goomba(rect, Vector2()))
-
-        elif color == c.PURPLE:
-            rect = Rectangle(Vector2(pos.x, pos.y - 24), 48, 72)
-            enemies.append(Turtle(rect, Vector2()))
-
-#Instantiate flagpole
-rect = Rectangle(Vector2(9504, 96), 48, 456)
-flag_pos = Vector2(9480, 120)
-c.flagpole = Flagpole(rect, flag_pos)
+from .level_loader import load_layout, GROUND, PIPE, COIN_QUESTION, BRICK, MUSHROOM_QUESTION, GOOMBA, TURTLE
+from .components.tiles import Question, Brick, Collider_Rect
+from .components.items import Coin, Super_Mushroom
+from .components.enemies import Goomba, Turtle
+import pygame as pg
+import math
 
+class Chunk():
+    """Fixed width horizontal slice of the level, its objects only exist while it is near the camera"""
+    def __init__(self, start_x):
+        self.start_x = start_x
+        self.end_x = start_x + c.CHUNK_WIDTH #Right edge of the widest object in the chunk
+        self.records = []
+
+        self.static_colliders = []
+        self.dynamic_colliders = []
+        self.coins = []
+
+    def add_record(self, number, record):
+        """Adds a layout record and its number in the layout, widens the chunk if the object sticks out of it"""
+        kind, x, y, w, h = record
+        self.records.append((number, record))
+        self.end_x = max(self.end_x, (x + w) * c.TILE_SIZE)
+
+    def load(self, world):
+        """Instantiate objects corresponding to the records of this chunk"""
+        for number, record in self.records:
+            for obj in create_objects(world, number, record):
+                if isinstance(obj, Collider_Rect):
+                    self.static_colliders.append(obj)
+                elif isinstance(obj, (Question, Brick)):
+                    self.dynamic_colliders.append(obj)
+                elif isinstance(obj, Coin):
+                    self.coins.append(obj)
+                elif isinstance(obj, Super_Mushroom):
+                    world.super_mushrooms.append(obj)
+                else:
+                    world.enemies.append(obj)
+
+        for collider in self.static_colliders:
+            world.collision_world.add_static(collider)
+        for collider in self.dynamic_colliders:
+            world.collision_world.add_dynamic(collider)
+        world.coins.extend(self.coins)
+
+    def unload(self, world):
+        """Drop the tiles and colliders of this chunk, moving entities are dropped once they are behind the camera"""
+        for collider in self.static_colliders + self.dynamic_colliders:
+            world.collision_world.remove(collider)
+            world.scheduler.deactivate('tiles', collider)
+            world.forget(collider)
+        for coin in self.coins:
+            world.coins.remove(coin)
+            world.scheduler.deactivate('coins', coin)
+            world.forget(coin)
+        self.clear()
+
+        #Enemies and items can walk out of the chunk they were created in
+        for entity_list, kind in [(world.enemies, 'enemies'), (world.super_mushrooms, 'mushrooms')]:
+            removed = [entity for entity in entity_list if world.is_behind_camera(entity)]
+            for entity in removed:
+                entity_list.remove(entity)
+                world.entity_sweep.remove(entity)
+                world.scheduler.remove(kind, entity)
+                world.forget(entity)
+                if kind == 'enemies':
+                    world.enemy_store.remove(entity)
+
+    def copy(self):
+        """Returns an unloaded chunk with the same records, every world loading a stage gets its own chunks"""
+        chunk = Chunk(self.start_x)
+        chunk.end_x = self.end_x
+        chunk.records = self.records
+        return chunk
+
+    def clear(self):
+        self.static_colliders = []
+        self.dynamic_colliders = []
+        self.coins = []
+
+    def get_snapshot(self):
+        """Returns the uids of the objects of a loaded chunk, see World.snapshot"""
+        return ([obj.uid for obj in self.static_colliders],
+                [obj.uid for obj in self.dynamic_colliders],
+                [obj.uid for obj in self.coins])
+
+    def restore_snapshot(self, snapshot, get_object):
+        static_colliders, dynamic_colliders, coins = snapshot
+        self.static_colliders = [get_object(uid) for uid in static_colliders]
+        self.dynamic_colliders = [get_object(uid) for uid in dynamic_colliders]
+        self.coins = [get_object(uid) for uid in coins]
+
+def create_objects(world, number, record):
+    """Instantiate the objects of layout record number, contents of question blocks come first
+
+    Objects get the uid 2 * number, the contents of a question block 2 * number + 1, see World.get_object.
+    """
+    kind, x, y, w, h = record
+    pos = Vector2(x * c.TILE_SIZE, y * c.TILE_SIZE + c.TILE_OFFSET_Y)
+    objects = []
+
+    #Ground = Static collider, blocks of tiles are merged into one collider
+    if kind == GROUND:
+        rect = Rectangle(pos, w * c.TILE_SIZE, h * c.TILE_SIZE)
+        objects.append(Collider_Rect(world, rect))
+
+    #Pipe collider, pipes next to each other can share one
+    elif kind == PIPE:
+        h = c.SCREEN_SIZE.y - pos.y
+        w = w * c.TILE_SIZE
+        rect = Rectangle(pos, w, h)
+        objects.append(Collider_Rect(world, rect))
+
+    #Question tile with coin as item
+    elif kind == COIN_QUESTION:
+        coin_rect = Rectangle(Vector2(pos.x, pos.y), 48, 42)
+        contents = Coin(world, coin_rect)
+        rect = Rectangle(pos, c.TILE_SIZE, c.TILE_SIZE)
+        objects += [contents, Question(world, rect, contents)]
+
+    #Brick tile
+    elif kind == BRICK:
+        rect = Rectangle(pos, c.TILE_SIZE, c.TILE_SIZE)
+        objects.append(Brick(world, rect))
+
+    #Question tile with mushroom as item
+    elif kind == MUSHROOM_QUESTION:
+        mushroom_rect = Rectangle(Vector2(pos.x, pos.y), c.TILE_SIZE, c.TILE_SIZE)
+        contents = Super_Mushroom(world, mushroom_rect, Vector2(c.MUSHROOM_START_VEL_X, 0))
+        rect = Rectangle(pos, c.TILE_SIZE, c.TILE_SIZE)
+        objects += [contents, Question(world, rect, contents)]
+
+    elif kind == GOOMBA:
+        rect = Rectangle(pos, c.TILE_SIZE, c.TILE_SIZE)
+        objects.append(Goomba(world, rect, Vector2()))
+
+    elif kind == TURTLE:
+        rect = Rectangle(Vector2(pos.x, pos.y - 24), 48, 72)
+        objects.append(Turtle(world, rect, Vector2()))
+
+    for part, obj in enumerate(reversed(objects)):
+        world.register(obj, 2 * number + part)
+    return objects
+
+#Stage -> Prepared_Stage, the parts of a stage that never change are shared by every world, see World.get_prepared_stage
+prepared_stages = {}
+
+class Prepared_Stage():
+    """Chunks and images of a stage, can be created on a worker thread since no level objects are instantiated
+
+    The chunks are copied by every world that loads the stage. Images are only loaded for worlds that get drawn,
+    converting them uses the display, so that is left to get_images, which runs on the main thread.
+    """
+    def __init__(self, stage):
+        self.stage = stage
+        self.decoded = None #(background, foreground) as loaded, see decode_images
+        self.images = None #(background, foreground) ready for drawing, see get_images
+
+        #Group the records of the compiled level layout into chunks based on their x position
+        self.chunks = []
+        self.records = load_layout(stage.map_path)
+        for number, record in enumerate(self.records):
+            index = record[1] * c.TILE_SIZE // c.CHUNK_WIDTH
+            while len(self.chunks) <= index:
+                self.chunks.append(Chunk(len(self.chunks) * c.CHUNK_WIDTH))
+            self.chunks[index].add_record(number, record)
+
+        self.enemy_count = sum(1 for record in self.records if record[0] in (GOOMBA, TURTLE))
+
+        #Size of the tile grid, pipes reach down to the bottom of the screen
+        self.columns = max([x + w for kind, x, y, w, h in self.records] + [1])
+        self.rows = max([y + h for kind, x, y, w, h in self.records] +
+                        [math.ceil((c.SCREEN_SIZE.y - c.TILE_OFFSET_Y) / c.TILE_SIZE)])
+
+    def decode_images(self):
+        """Loads the images without converting them, which can also be done on a worker thread"""
+        if self.decoded is None and self.images is None:
+            self.decoded = (pg.image.load(self.stage.background_path), pg.image.load(self.stage.foreground_path))
+
+    def get_images(self):
+        """Returns the background and the foreground, the first call converts them and has to be on the main thread"""
+        if self.images is None:
+            self.decode_images()
+            background, foreground = self.decoded
+            if pg.display.get_surface() is not None:
+                #The large background is converted by the renderer, a chunk at a time
+                foreground = foreground.convert_alpha()
+            self.images = (background, foreground)
+            self.decoded = None
+        return self.images
@@ -0,0 +1,163 @@
+from os import path, makedirs
+from . import config as c
+import numpy as np
+import hashlib
+import struct
+
+cache_folder = path.join(path.dirname(__file__), 'resources', 'cache')
+
+#Record kinds of a compiled level layout
+GROUND = 0
+PIPE = 1
+COIN_QUESTION = 2
+BRICK = 3
+MUSHROOM_QUESTION = 4
+GOOMBA = 5
+TURTLE = 6
+
+#Bump when the layout format or the parsing rules change, so old caches get rebuilt
+CACHE_VERSION = 4
+
+#Header: magic, version, sha1 of map.png, number of records
+HEADER = struct.Struct('<4sH20sI')
+#Record: kind, x, y, w, h (all in tiles)
+RECORD = struct.Struct('<BHHHH')
+MAGIC = b'PMLC'
+
+def get_map_hash(map_path):
+    """Returns the sha1 digest of the contents of a map image"""
+    with open(map_path, 'rb') as map_file:
+        return hashlib.sha1(map_file.read()).digest()
+
+def get_cache_path(map_path):
+    """Returns the path of the compiled layout belonging to a map image"""
+    name = path.splitext(path.basename(map_path))[0]
+    return path.join(cache_folder, name + '.bin')
+
+def pack_colors(pixels):
+    """Packs RGBA values into single integers so colors can be compared in one operation"""
+    pixels = np.asarray(pixels, dtype = np.uint32)
+    return (pixels[..., 0] << 24) | (pixels[..., 1] << 16) | (pixels[..., 2] << 8) | pixels[..., 3]
+
+def get_runs(mask):
+    """Returns y, start x and length of every horizontal run of True values in a 2D mask"""
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype = np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis = 1)
+
+    #Starts and ends are found in the same row-major order, so they pair up
+    start_y, start_x = np.nonzero(edges == 1)
+    end_y, end_x = np.nonzero(edges == -1)
+    return start_y, start_x, end_x - start_x
+
+def merge_runs(run_y, run_x, run_w):
+    """Merges runs with an identical run directly below them into rectangles, returns [x, y, w, h] lists
+
+    Sorted by x, width and y, the runs of one rectangle are next to each other, so no run is looked at in Python.
+    """
+    order = np.lexsort((run_y, run_w, run_x))
+    run_y, run_x, run_w = run_y[order], run_x[order], run_w[order]
+
+    #A rectangle starts at every run that doesn't continue the run before it one row further down
+    starts = np.ones(len(order), dtype = bool)
+    starts[1:] = (run_x[1:] != run_x[:-1]) | (run_w[1:] != run_w[:-1]) | (run_y[1:] != run_y[:-1] + 1)
+    first = np.nonzero(starts)[0]
+    heights = np.diff(np.append(first, len(order)))
+    return np.stack([run_x[first], run_y[first], run_w[first], heights], axis = 1).tolist()
+
+def get_ground_rects(mask):
+    """Covers a mask with rectangles, merging rows first or columns first depending on which gives fewer"""
+    by_rows = merge_runs(*get_runs(mask))
+
+    #Runs of the transposed mask are columns, so x and y as well as w and h are swapped
+    by_columns = [[x, y, w, h] for y, x, h, w in merge_runs(*get_runs(mask.T))]
+
+    return by_rows if len(by_rows) <= len(by_columns) else by_columns
+
+def get_pipe_rects(pipe_y, pipe_x):
+    """Merges pipes into as few colliders as possible, returns [x, y, w] lists"""
+    #Pipe colliders reach down to the bottom of the screen, so only the highest pipe in a column matters
+    highest = {}
+    for y, x in zip(pipe_y.tolist(), pipe_x.tolist()):
+        highest[x] = min(y, highest.get(x, y))
+
+    #Pipes of the same height that touch each other become one collider
+    rects = []
+    for x in sorted(highest):
+        y = highest[x]
+        if rects and rects[-1][1] == y and rects[-1][0] + rects[-1][2] == x:
+            rects[-1][2] += 2
+        else:
+            rects.append([x, y, 2])
+    return rects
+
+def parse_map(map_path):
+    """Read pixel data from a level map and return a list of (kind, x, y, w, h) records"""
+    #PIL is only needed when there is no valid cache, so it is imported here to keep start up fast
+    from PIL import Image
+
+    with Image.open(map_path) as image:
+        colors = pack_colors(image.convert('RGBA'))
+
+    #Records are gathered with the position they would have in a row by row scan as sort key
+    records = []
+
+    #Black = Static ground collider, blocks of tiles are merged into rectangles for optimizations
+    for x, y, w, h in get_ground_rects(colors == pack_colors(c.BLACK)):
+        records.append(((y, x + w - 1), (GROUND, x, y, w, h)))
+
+    #Red = Pipe collider
+    for x, y, w in get_pipe_rects(*np.nonzero(colors == pack_colors(c.RED))):
+        records.append(((y, x), (PIPE, x, y, w, 1)))
+
+    for kind, color in [(COIN_QUESTION, c.YELLOW),
+                        (BRICK, c.GRAY),
+                        (MUSHROOM_QUESTION, c.GREEN),
+                        (GOOMBA, c.BROWN),
+                        (TURTLE, c.PURPLE)]:
+        for y, x in zip(*np.nonzero(colors == pack_colors(color))):
+            records.append(((int(y), int(x)), (kind, int(x), int(y), 1, 1)))
+
+    records.sort(key = lambda record: record[0])
+    return [record for key, record in records]
+
+def read_cache(cache_path, map_hash):
+    """Returns the cached layout if it was compiled from a map with the same hash, otherwise None"""
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            data = cache_file.read()
+    except OSError:
+        return None
+
+    if len(data) < HEADER.size:
+        return None
+    magic, version, cached_hash, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != CACHE_VERSION or cached_hash != map_hash:
+        return None
+    if len(data) != HEADER.size + count * RECORD.size:
+        return None
+    return list(RECORD.iter_unpack(data[HEADER.size:]))
+
+def write_cache(cache_path, map_hash, layout):
+    """Store a compiled layout, failing silently when the cache folder can't be written to"""
+    data = bytearray(HEADER.pack(MAGIC, CACHE_VERSION, map_hash, len(layout)))
+    for record in layout:
+        data += RECORD.pack(*record)
+
+    try:
+        makedirs(path.dirname(cache_path), exist_ok = True)
+        with open(cache_path, 'wb') as cache_file:
+            cache_file.write(data)
+    except OSError:
+        pass
+
+def load_layout(map_path):
+    """Returns the layout of a map, parsing the image only when the cache is missing or outdated"""
+    map_hash = get_map_hash(map_path)
+    cache_path = get_cache_path(map_path)
+
+    layout = read_cache(cache_path, map_hash)
+    if layout is None:
+        layout = parse_map(map_path)
+        write_cache(cache_path, map_hash, layout)
+    return layout
@@ -1,94 +1,109 @@
 from . import config as c
-from . import level
 from . import sprites
 from . import sounds
-from .basetypes import Camera, Vector2, Rectangle, Digit_System
+from . import stages
+from .basetypes import Vector2, Digit_System
+from .world import World
+from .renderer import Renderer
+from .snapshot import pack_snapshot, unpack_snapshot
 import pygame as pg
-from .components import mario
 
 class Main():
     """Contains main loop and handles the game"""
-    def __init__(self):
-        c.camera = Camera(Vector2(), c.SCREEN_SIZE.x, c.SCREEN_SIZE.y)
-        c.mario = mario.Mario(Rectangle(c.MARIO_START_POSITION, 36, 48))
+    def __init__(self, recorder = None, replay = None, stage = 0, draw = True):
+        self.quit_state = None
+        self.renderer = Renderer(c.screen) if draw else None #Headless games that don't draw skip loading images
+        self.world = World(self.renderer) #Everything the world draws goes through the renderer
+        self.text_area = sprites.text_image.get_bounding_rect() #Only the text of the overlay gets blitted
+
+        #Frames are recorded to recorder, or read from replay instead of the keyboard
+        self.recorder = recorder
+        self.replay_frames = None
+        if recorder is not None:
+            recorder.start(self.world)
+        if replay is not None:
+            replay.start(self.world)
+            self.replay_frames = replay.frames()
+        self.score_system = Digit_System(Vector2(66, 49), 6) #Displays total score on screen
+        self.coin_score = Digit_System(Vector2(306, 49), 2) #Displays collected coins on screen
+        self.load_stage(stage)
 
+    def load_stage(self, index):
+        """Load a stage and reset everything that doesn't carry over between stages"""
+        self.stage_index = index
+        self.world.load_stage(index)
+
+        pg.mixer.music.set_endevent()
         pg.mixer.music.load(sounds.main_theme)
         pg.mixer.music.play()
 
-        self.quit_state = None
         self.out_of_time = False
 
-        self.score_system = Digit_System(Vector2(66, 49), 6) #Displays total score on screen
-        self.coin_score = Digit_System(Vector2(306, 49), 2) #Displays collected coins on screen
         self.time = Digit_System(Vector2(610, 49), 3, 300) #Displays time on screen
         self.timer = 0 #timer for counting down the in-game time
 
     def draw(self):
-        """Draw all GameObjects and sprites that are currently on screen"""
-        c.screen.fill(c.BACKGROUND_COLOR)
-        self.draw_background()
-        
-        for item in (level.coins + level.super_mushrooms):
-            if item.deployed:
-                item.draw()
-
-        for tile in level.dynamic_colliders:
-            if c.camera.contains(tile.rect):
-                view_pos = c.camera.to_view_space(tile.pos)
+        """Draw all GameObjects and sprites that are currently on screen, the background is kept by the renderer"""
+        world = self.world
+        world.camera.view_x = int(world.interpolator.get(world.camera.pos)[0])
+        self.renderer.start_frame(world)
+
+        for item in world.scheduler.get_active('coins') + world.scheduler.get_active('mushrooms'):
+            item.draw()
+
+        for tile in world.collision_world.dynamic_colliders:
+            if world.camera.contains(tile.rect):
+                view_pos = world.camera.to_view_space(tile.pos)
                 tile.draw(view_pos)
 
-        for enemy in level.enemies:
-            if enemy.is_active:
-                enemy.draw()
+        for enemy in world.scheduler.get_active('enemies'):
+            enemy.draw()
 
-        for fragment in level.brick_fragments:
+        for fragment in world.brick_fragments:
             fragment.draw()
 
-        c.flagpole.draw_flag()
+        world.flagpole.draw_flag()
 
-        c.mario.draw()
+        world.mario.draw()
 
         self.draw_foreground()
         self.draw_digit_systems()
 
-    def draw_background(self):
-        """Extract rectangle from background image based on camera position"""
-        c.screen.blit(sprites.background, 
-                      (0, 0), 
-                      (c.camera.pos.x, c.camera.pos.y, c.SCREEN_SIZE.x, c.SCREEN_SIZE.y))
-
     def draw_foreground(self):
         """Draw the foreground at the end of the level to make mario disappear behind the castle"""
-        view_pos = c.camera.to_view_space(c.FOREGROUND_POS)
-        if view_pos.x < c.camera.pos.x + c.SCREEN_SIZE.x:
-            c.screen.blit(sprites.foreground, (view_pos.x, view_pos.y))
-        c.screen.blit(sprites.text_image, (0,0))
+        world = self.world
+        view_pos = world.camera.to_view_space(world.foreground_pos)
+        if view_pos.x < world.camera.pos.x + c.SCREEN_SIZE.x:
+            world.screen.blit(world.foreground, (view_pos.x, view_pos.y))
+        world.screen.blit(sprites.text_image, self.text_area, self.text_area)
 
     def draw_digit_systems(self):
         """Draw all digit systems on screen"""
-        self.score_system.draw()
-        self.coin_score.draw()
-        self.time.draw()
+        self.score_system.draw(self.world.screen)
+        self.coin_score.draw(self.world.screen)
+        self.time.draw(self.world.screen)
 
     def handle_digit_systems(self):
         """Updates all on-screen digit systems"""
-        if not c.mario.current_mario_state == 'Dead_Mario':
+        world = self.world
+        if not world.mario.current_mario_state == world.mario.DEAD_MARIO:
             self.handle_time()
-            self.score_system.update_value(c.total_score)
-            self.coin_score.update_value(c.collected_coins)
+            self.score_system.update_value(world.total_score)
+            self.coin_score.update_value(world.collected_coins)
 
     def handle_time(self):
         """Handles events delegated to the on-screen timer"""
+        world = self.world
 
         #Count down the timer
-        self.timer += c.delta_time
-        if not c.final_count_down and self.timer > 14 * c.delta_time:
+        self.timer += world.delta_time
+        if not world.final_count_down and self.timer > 14 * world.delta_time:
             self.time.update_value(self.time.total_value - 1)
             self.timer = 0
 
         #If timer is lower than 100, play out of time music
-        if not c.mario.current_mario_state == 'Win_State':
-            if not c.final_count_down and self.time.total_value < 100 and not self.out_of_time:
+        if not world.mario.current_mario_state == world.mario.WIN_STATE:
+            if not world.final_count_down and self.time.total_value < 100 and not self.out_of_time:
                 pg.mixer.music.stop()
                 pg.mixer.music.set_endevent(c.OUT_OF_TIME_END)
                 pg.mixer.music.load(sounds.out_of_time)
@@ -96,13 +111,13 @@ class Main():
                 self.out_of_time = True
 
         #If the timer runs out and mario has not won, kill mario
-        if not c.final_count_down and self.time.total_value == 0:
-            c.mario.mario_states.on_event('dead')
+        if not world.final_count_down and self.time.total_value == 0:
+            world.mario.mario_states.on_event(c.DEAD)
 
         #If mario has won and time is still > 0, count down and add score
-        if c.final_count_down and self.time.total_value > 0:
+        if world.final_count_down and self.time.total_value > 0:
             self.time.update_value(self.time.total_value - 1)
-            c.total_score += c.TIME_SCORE
+            world.total_score += c.TIME_SCORE
             sounds.count_down.play()
             sounds.count_down.set_volume(0.15)
             if self.time.total_value == 0:
@@ -111,26 +126,49 @@ class Main():
 
     def update_level(self):
         """Update all Gameobjects in the level"""
-        c.mario.update()
-        c.mario.physics_update()
-        c.camera.update()
-        for tile in level.dynamic_colliders:
+        world = self.world
+        #Shells are the fastest entities, so nothing moves further than this along x in one frame
+        margin = c.SHELL_VEL_X * world.delta_time
+        world.entity_sweep.update([world.super_mushrooms, world.enemies, [world.mario]], margin)
+
+        world.mario.update()
+        world.mario.physics_update()
+        world.camera.update()
+        world.update_chunks()
+
+        #Only objects in the active sets of the scheduler get updated
+        for tile in world.scheduler.get_active('tiles'):
             tile.update()
 
-        for item in (level.coins + level.super_mushrooms):
-            if item.deployed:
-                item.update()
+        for coin in world.scheduler.get_active('coins'):
+            coin.update()
 
-        if not c.mario.freeze_movement:
-            for enemy in level.enemies:
-                if enemy.pos.x < c.camera.pos.x + c.SCREEN_SIZE.x:
-                    enemy.is_active = True
+        mushrooms = world.scheduler.get_active('mushrooms')
+        for item in mushrooms:
+            item.update()
+
+        enemies = []
+        if not world.mario.freeze_movement:
+            world.scheduler.activate_reached(world.camera.pos.x + c.SCREEN_SIZE.x)
+            enemies = world.scheduler.get_active('enemies')
+            for enemy in enemies:
                 enemy.update()
 
-        for fragment in level.brick_fragments:
+            #Gravity, moving and tile collisions of all enemies run on the arrays of the enemy store
+            world.enemy_store.move(world.collision_world, world.entity_sweep, world.delta_time)
+
+        #Tile collisions of the mushrooms are resolved in one batch per axis
+        world.collision_world.move_batch([item for item in mushrooms if item.moving], world.delta_time)
+        for entity in mushrooms + enemies:
+            entity.late_update()
+
+        for fragment in world.brick_fragments:
             fragment.update()
 
-        c.flagpole.update()
+        world.flagpole.update()
+
+        #Everything destroyed this frame is taken out of its list at once
+        world.compact()
 
     def check_for_quit(self):
         """event manager for quitting the app or going back to menu"""
@@ -139,8 +177,11 @@ class Main():
                 return False
             
             if event.type == c.WIN_SONG_END and self.time.total_value == 0:
-                self.quit_state = 'menu'
-                return False
+                if self.stage_index + 1 < len(stages.STAGES):
+                    self.load_stage(self.stage_index + 1)
+                else:
+                    self.quit_state = 'menu'
+                    return False
 
             if event.type == c.DEATH_SONG_END:
                 self.quit_state = 'menu'
@@ -151,25 +192,84 @@ class Main():
                 pg.mixer.music.load(sounds.main_theme_sped_up)
                 pg.mixer.music.play()
 
-        if c.mario.to_menu:
+        if self.world.mario.to_menu:
             self.quit_state = 'menu'
             return False
 
-        if c.keys[pg.K_ESCAPE]:
+        if self.world.keys[pg.K_ESCAPE]:
             return False
         return True
 
+    def get_moving_positions(self):
+        """Returns the position vectors of everything that can move, these get interpolated while drawing"""
+        world = self.world
+        positions = [world.camera.pos, world.mario.pos]
+        for kind in ['tiles', 'coins', 'mushrooms', 'enemies']:
+            positions += [obj.pos for obj in world.scheduler.get_active(kind)]
+        positions += [fragment.pos for fragment in world.brick_fragments]
+        return positions
+
+    def snapshot(self):
+        """Returns the state of the game as bytes, take it between steps and pass it to restore to go back to it"""
+        values = (self.timer, self.out_of_time, self.time.total_value,
+                  self.score_system.total_value, self.coin_score.total_value)
+        return pack_snapshot(self.stage_index, (self.world.random.getstate(), values, self.world.snapshot()))
+
+    def restore(self, snapshot):
+        """Continue from a snapshot, the game then runs exactly like it did after the snapshot was taken
+
+        Snapshots can also be restored in another Main, even in another process. Music and sounds
+        aren't part of them, and neither is how far a recording or replay has got.
+        """
+        stage, (random_state, values, world_snapshot) = unpack_snapshot(snapshot)
+        if stage != self.stage_index:
+            self.load_stage(stage)
+
+        self.world.random.setstate(random_state)
+        self.timer, self.out_of_time, time, score, coins = values
+        self.time.update_value(time)
+        self.score_system.update_value(score)
+        self.coin_score.update_value(coins)
+        self.world.restore(world_snapshot)
+
+    def step(self, interpolate = True):
+        """Advance the simulation by one fixed time step, returns False when a replay has run out of frames
+
+        Games that never draw pass interpolate = False, nothing reads the stored positions then.
+        """
+        world = self.world
+        if self.replay_frames is not None:
+            frame = next(self.replay_frames, None)
+            if frame is None:
+                return False
+            world.keys, world.delta_time = frame
+        if self.recorder is not None:
+            self.recorder.record(world.keys, world.delta_time)
+
+        if interpolate:
+            world.interpolator.store(self.get_moving_positions())
+        self.update_level()
+        self.handle_digit_systems()
+        return True
+
     def main_loop(self):
-        """Main game loop, updates and draws the level every frame"""
+        """Main game loop, runs as many fixed steps as the passed time allows and draws once per frame"""
+        world = self.world
+        world.delta_time = c.TIME_STEP
+        accumulator = 0
         while True:
-            c.delta_time = c.clock.tick(60)
-            c.keys = pg.key.get_pressed()
+            accumulator += min(c.clock.tick(c.FRAME_RATE_LIMIT), c.MAX_FRAME_TIME)
+            world.keys = pg.key.get_pressed()
+
+            while accumulator >= c.TIME_STEP:
+                if not self.step():
+                    return
+                accumulator -= c.TIME_STEP
 
-            self.update_level()
-            self.handle_digit_systems()
+            world.interpolator.alpha = accumulator / c.TIME_STEP
             self.draw()
 
             if not self.check_for_quit():
                 break
 
-            pg.display.update()
\ No newline at end of file
+            pg.display.update(self.renderer.get_dirty_rects())
\ No newline at end of file
@@ -12,23 +12,24 @@ class Menu():
         self.pressed_down = False
 
         self.selector_pos = Vector2(239, 404)
+        self.keys = None #Keys held this frame
 
     def draw(self):
         c.screen.fill((0, 0, 0))
         c.screen.blit(sprites.menu, (0, 0))
-        c.screen.blit(sprites.tile_set, (self.selector_pos.x, self.selector_pos.y), sprites.SELECTOR)
+        c.screen.blit(sprites.images[sprites.SELECTOR], (self.selector_pos.x, self.selector_pos.y))
 
     def input_actions(self):
-        if c.keys[pg.K_w] and not self.pressed_down and not self.pressed_up:
+        if self.keys[pg.K_w] and not self.pressed_down and not self.pressed_up:
             self.selected += 1
             self.pressed_up = True
-        if c.keys[pg.K_s] and not self.pressed_up and not self.pressed_down:
+        if self.keys[pg.K_s] and not self.pressed_up and not self.pressed_down:
             self.selected -= 1
             self.pressed_down = True
 
-        if not c.keys[pg.K_w]:
+        if not self.keys[pg.K_w]:
             self.pressed_up = False
-        if not c.keys[pg.K_s]:
+        if not self.keys[pg.K_s]:
             self.pressed_down = False
 
     def check_for_quit(self):
@@ -37,11 +38,11 @@ class Menu():
                 self.quit_state = 'exit'
                 return False
 
-        if c.keys[pg.K_ESCAPE]:
+        if self.keys[pg.K_ESCAPE]:
             self.quit_state = 'exit'
             return False
 
-        if c.keys[pg.K_RETURN] and self.selected % 2 == 0:
+        if self.keys[pg.K_RETURN] and self.selected % 2 == 0:
             self.quit_state = 'play'
             return False
 
@@ -49,8 +50,8 @@ class Menu():
 
     def menu_loop(self):
         while True:
-            c.keys = pg.key.get_pressed()
-            c.clock.tick()
+            self.keys = pg.key.get_pressed()
+            c.clock.tick(c.FRAME_RATE_LIMIT)
 
             self.input_actions()
             if self.selected % 2 == 0:
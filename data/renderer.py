@@ -0,0 +1,97 @@
+from . import config as c
+import pygame as pg
+
+class Renderer():
+    """Draws the frames of a world onto a surface, redrawing and updating only what changed since the last frame
+
+    The world draws with blit like it would onto a surface, every blitted rectangle is remembered and erased at the
+    start of the next frame by copying the backdrop over it. When the camera scrolls, the previous frame is
+    shifted with Surface.scroll and only the strip that came into view is copied from the backdrop.
+    """
+    def __init__(self, screen):
+        self.screen = screen
+        self.screen_rect = pg.Rect(0, 0, c.SCREEN_SIZE.x, c.SCREEN_SIZE.y)
+
+        #Background of the stage on top of the background color, baked from the left as the camera gets to it
+        self.background = None
+        self.backdrop = None
+        self.backdrop_rect = None
+        self.baked_x = 0 #Columns left of this are baked
+
+        self.view = None #Camera position of the last frame, None when the whole screen has to be redrawn
+        self.drawn = [] #Rectangles blitted this frame
+        self.erased = [] #Rectangles of the last frame that were erased this frame
+        self.full_update = True #Whether every pixel may have changed this frame
+
+    def blit(self, source, dest, area = None):
+        """Blits onto the screen and remembers the rectangle, so it gets erased next frame"""
+        rect = self.screen.blit(source, dest, area)
+        if rect.w and rect.h:
+            self.drawn.append(rect)
+        return rect
+
+    def set_backdrop(self, background):
+        """Starts a backdrop for a background, so erasing copies opaque pixels instead of blending alpha"""
+        self.background = background
+        self.backdrop = pg.Surface(background.get_size(), 0, self.screen)
+        self.backdrop_rect = self.backdrop.get_rect()
+        self.baked_x = 0
+        self.view = None
+
+    def bake(self, right):
+        """Bakes the backdrop up to x = right a chunk at a time, so starting a stage doesn't stall on the whole image"""
+        if right > self.baked_x:
+            right = max(right, self.baked_x + c.CHUNK_WIDTH)
+            area = pg.Rect(self.baked_x, 0, right - self.baked_x, self.backdrop_rect.h).clip(self.backdrop_rect)
+            if area.w:
+                self.backdrop.fill(c.BACKGROUND_COLOR, area)
+                #Converting first is several times faster than blending the pixels of the loaded image directly
+                self.backdrop.blit(self.background.subsurface(area).convert_alpha(), area)
+            self.baked_x = right
+
+    def draw_backdrop(self, rect):
+        """Copies the backdrop behind a rectangle of the screen"""
+        area = rect.move(self.view)
+        self.bake(area.right)
+        if not self.backdrop_rect.contains(area):
+            self.screen.fill(c.BACKGROUND_COLOR, rect)
+        self.screen.blit(self.backdrop, rect, area)
+
+    def start_frame(self, world):
+        """Moves the last frame to the current camera position and erases everything drawn on it
+
+        The camera is drawn at whole pixels, so the frame can be shifted without resampling.
+        """
+        if world.background is not self.background:
+            self.set_backdrop(world.background)
+
+        view = (int(world.camera.view_x), int(world.camera.pos.y))
+        scroll = 0
+        if self.view is not None and self.view[1] == view[1]:
+            scroll = view[0] - self.view[0]
+        self.full_update = self.view is None or self.view[1] != view[1] or abs(scroll) >= self.screen_rect.w
+        self.view = view
+        self.erased = []
+
+        if self.full_update:
+            self.draw_backdrop(self.screen_rect)
+        else:
+            if scroll:
+                self.screen.scroll(-scroll, 0)
+                if scroll > 0:
+                    self.draw_backdrop(pg.Rect(self.screen_rect.w - scroll, 0, scroll, self.screen_rect.h))
+                else:
+                    self.draw_backdrop(pg.Rect(0, 0, -scroll, self.screen_rect.h))
+                self.full_update = True
+
+            for rect in self.drawn:
+                rect.move_ip(-scroll, 0)
+                self.draw_backdrop(rect)
+            self.erased = self.drawn
+        self.drawn = []
+
+    def get_dirty_rects(self):
+        """Returns the rectangles of the screen that changed this frame, for pg.display.update"""
+        if self.full_update:
+            return [self.screen_rect]
+        return self.erased + self.drawn
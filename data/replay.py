@@ -0,0 +1,89 @@
+from .headless import Key_State
+import pygame as pg
+import random
+import struct
+
+#Keys the game reads from World.keys, a frame stores them as bits of a mask in this order
+KEYS = [pg.K_a, pg.K_d, pg.K_s, pg.K_w, pg.K_SPACE, pg.K_ESCAPE]
+
+#Bump when the file format changes
+REPLAY_VERSION = 1
+
+#Header: magic, version, stage index, rng seed, number of runs
+HEADER = struct.Struct('<4sHHQI')
+#Run: number of frames, key mask, delta time of every frame in the run
+RUN = struct.Struct('<IBd')
+MAGIC = b'PMRP'
+
+def get_key_mask(keys):
+    """Packs the state of the keys the game reads into one integer"""
+    mask = 0
+    for bit, key in enumerate(KEYS):
+        if keys[key]:
+            mask |= 1 << bit
+    return mask
+
+def get_pressed_keys(mask):
+    """Returns the keys that are pressed in a key mask"""
+    return [key for bit, key in enumerate(KEYS) if mask & (1 << bit)]
+
+class Recorder():
+    """Records the keys and delta time of every frame, consecutive identical frames are stored as one run"""
+    def __init__(self, stage = 0, seed = None):
+        self.stage = stage
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.runs = [] #[frames, key mask, delta time]
+
+    def start(self, world):
+        """Seed the rng of the world and drop earlier frames, call right before the first frame"""
+        world.random.seed(self.seed)
+        self.runs = []
+
+    def record(self, keys, delta_time):
+        mask = get_key_mask(keys)
+        if self.runs and self.runs[-1][1] == mask and self.runs[-1][2] == delta_time:
+            self.runs[-1][0] += 1
+        else:
+            self.runs.append([1, mask, delta_time])
+
+    def save(self, replay_path):
+        data = bytearray(HEADER.pack(MAGIC, REPLAY_VERSION, self.stage, self.seed, len(self.runs)))
+        for frames, mask, delta_time in self.runs:
+            data += RUN.pack(frames, mask, delta_time)
+        with open(replay_path, 'wb') as replay_file:
+            replay_file.write(data)
+
+class Replay():
+    """Recorded frames that can be fed back to the game, see Main.step and Headless_Game.play"""
+    def __init__(self, stage, seed, runs):
+        self.stage = stage
+        self.seed = seed
+        self.runs = runs
+
+    @classmethod
+    def load(cls, replay_path):
+        with open(replay_path, 'rb') as replay_file:
+            data = replay_file.read()
+
+        if len(data) < HEADER.size:
+            raise ValueError('Not a replay file: ' + replay_path)
+        magic, version, stage, seed, count = HEADER.unpack_from(data)
+        if magic != MAGIC or len(data) != HEADER.size + count * RUN.size:
+            raise ValueError('Not a replay file: ' + replay_path)
+        if version != REPLAY_VERSION:
+            raise ValueError('Replay was recorded with format version %d, expected %d' % (version, REPLAY_VERSION))
+        return cls(stage, seed, [list(run) for run in RUN.iter_unpack(data[HEADER.size:])])
+
+    def start(self, world):
+        """Seed the rng of the world like the recording did, call right before the first frame"""
+        world.random.seed(self.seed)
+
+    def get_frame_count(self):
+        return sum(frames for frames, mask, delta_time in self.runs)
+
+    def frames(self):
+        """Yields the keys and delta time of every frame"""
+        for frames, mask, delta_time in self.runs:
+            keys = Key_State(get_pressed_keys(mask))
+            for i in range(frames):
+                yield keys, delta_time
@@ -0,0 +1,24 @@
+import marshal
+import struct
+
+#Bump when the snapshot format changes
+SNAPSHOT_VERSION = 3
+
+#Header: magic, version, stage index, the state follows in marshal format
+HEADER = struct.Struct('<4sHH')
+MAGIC = b'PMSS'
+
+def pack_snapshot(stage, state):
+    """Returns a snapshot as bytes, state may only consist of values marshal can store"""
+    return HEADER.pack(MAGIC, SNAPSHOT_VERSION, stage) + marshal.dumps(state)
+
+def unpack_snapshot(data):
+    """Returns the stage index and the state of a snapshot"""
+    if len(data) < HEADER.size:
+        raise ValueError('Not a snapshot')
+    magic, version, stage = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('Not a snapshot')
+    if version != SNAPSHOT_VERSION:
+        raise ValueError('Snapshot has format version %d, expected %d' % (version, SNAPSHOT_VERSION))
+    return stage, marshal.loads(data[HEADER.size:])
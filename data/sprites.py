@@ -1,6 +1,6 @@
+from .utils import get_flipped_sprite
 from os import path
 import pygame as pg
-from PIL import Image
 
 graphics_folder = path.join(path.dirname(__file__), 'resources', 'graphics')
 
@@ -8,11 +8,15 @@ graphics_folder = path.join(path.dirname(__file__), 'resources', 'graphics')
 tile_set = pg.image.load(path.join(graphics_folder, 'tile_set.png'))
 tile_set_flipped = pg.image.load(path.join(graphics_folder, 'tile_set_flipped.png'))
 text_image = pg.image.load(path.join(graphics_folder, 'text_image.png'))
-background = pg.image.load(path.join(graphics_folder, 'background.png'))
-foreground = pg.image.load(path.join(graphics_folder, 'foreground.png'))
 menu = pg.image.load(path.join(graphics_folder, 'menu.png'))
 digits = pg.image.load(path.join(graphics_folder, 'digits.png'))
-level_1 = Image.open(path.join(graphics_folder, 'map.png'))
+
+#Maps, backgrounds and foregrounds are loaded per stage, see stages.py
+
+#Filled by convert_images
+images = {} #Sprite rectangle -> the sprite cut out of tile_set
+flipped_images = {} #Sprite rectangle -> the mirrored sprite cut out of tile_set_flipped
+digit_images = [] #Images of the digits 0 to 9
 
 #Sprite rectangles to retrieve section of atlas
 EMPTY_SPRITE = (240, 48, 48, 48)
@@ -104,4 +108,34 @@ WIN_SPRITES_SMALL = [
 
 SELECTOR = (394, 12, 24, 24)
 
-
+def cut_sprite(atlas, rect):
+    """Returns the part of an atlas in rect, parts of rect outside the atlas stay transparent like they do when blitting with an area"""
+    if atlas.get_rect().contains(rect):
+        return atlas.subsurface(rect)
+    image = pg.Surface(rect[2:], pg.SRCALPHA, atlas)
+    image.blit(atlas, (0, 0), rect)
+    return image
+
+def convert_images():
+    """Converts the images to the pixel format of the display and cuts every sprite out of the atlases
+
+    Call after pg.display.set_mode. Converted images blit without converting every pixel, and the cut out
+    sprites are blitted as they are instead of through a source rectangle.
+    """
+    global tile_set, tile_set_flipped, text_image, menu, digits
+    if images:
+        return
+    tile_set = tile_set.convert_alpha()
+    tile_set_flipped = tile_set_flipped.convert_alpha()
+    text_image = text_image.convert_alpha()
+    menu = menu.convert()
+    digits = digits.convert_alpha()
+
+    #Every upper case name of this module is a sprite rectangle or a list of them
+    for name, value in list(globals().items()):
+        if name.isupper():
+            for rect in value if isinstance(value, list) else [value]:
+                images[rect] = cut_sprite(tile_set, rect)
+                flipped_images[rect] = cut_sprite(tile_set_flipped, get_flipped_sprite(rect))
+
+    digit_images[:] = [digits.subsurface((24 * digit, 0, 24, 21)) for digit in range(10)]
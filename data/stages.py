@@ -0,0 +1,34 @@
+from os import path
+from .sprites import graphics_folder
+
+class Stage():
+    """Describes a stage, holds everything that depends on the map of the stage"""
+    def __init__(self, name, map_name, background_name, foreground_name, foreground_pos,
+                 flagpole_rect, flag_pos, maximum_camera_scroll, level_end_x):
+        self.name = name
+
+        self.map_path = path.join(graphics_folder, map_name)
+        self.background_path = path.join(graphics_folder, background_name)
+        self.foreground_path = path.join(graphics_folder, foreground_name)
+
+        #Positions are kept as tuples because the objects created from them get modified while playing
+        self.foreground_pos = foreground_pos
+        self.flagpole_rect = flagpole_rect
+        self.flag_pos = flag_pos
+
+        #Camera bounds and the x position where mario stops walking after winning
+        self.maximum_camera_scroll = maximum_camera_scroll
+        self.level_end_x = level_end_x
+
+#Stages in the order they are played
+STAGES = [
+    Stage(name = '1-1',
+          map_name = 'map.png',
+          background_name = 'background.png',
+          foreground_name = 'foreground.png',
+          foreground_pos = (9840, 505),
+          flagpole_rect = (9504, 96, 48, 456),
+          flag_pos = (9480, 120),
+          maximum_camera_scroll = 9300,
+          level_end_x = 9840)
+]
@@ -1,5 +1,3 @@
-from . import config as c
-from .basetypes import Vector2
 import math
 
 def clamp(x, a, b):
@@ -8,7 +6,7 @@ def clamp(x, a, b):
 
 def accelerate(obj, accel_x, accel_y, limit_x = None):
     """Accelerate until limit is reached"""
-    obj.vel += Vector2(accel_x, accel_y) * c.delta_time
+    obj.vel.add_scaled(accel_x, accel_y, obj.world.delta_time)
     if limit_x != None:
         if obj.vel.x > 0:
             obj.vel.x = clamp(obj.vel.x, 0, limit_x)
@@ -18,4 +16,10 @@ def accelerate(obj, accel_x, accel_y, limit_x = None):
 def get_flipped_sprite(sprite):
     """Returns coordinates of a flipped sprite"""
     #429 is the width of the atlas
-    return (429 - sprite[0] - sprite[2], sprite[1], sprite[2], sprite[3])
\ No newline at end of file
+    return (429 - sprite[0] - sprite[2], sprite[1], sprite[2], sprite[3])
+def get_attributes(obj):
+    """Returns the attributes of a helper object like an animation as a dict, without its reference to the world"""
+    return {name: value for name, value in vars(obj).items() if name != 'world'}
+
+def set_attributes(obj, attributes):
+    vars(obj).update(attributes)
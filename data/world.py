@@ -0,0 +1,319 @@
+from . import stages
+from . import config as c
+from .basetypes import Vector2, Rectangle, Camera, Interpolator, Collision_World, Sweep_And_Prune, Scheduler, Pool, Object_List
+from .level import Prepared_Stage, prepared_stages, create_objects
+from .components.tiles import Brick_Fragment, Flagpole
+from .components.enemies import Enemy_Store
+from .components.mario import Mario
+import threading
+import random
+
+class World():
+    """Owns the state of one game, objects in it get the world passed in instead of using module globals
+
+    Worlds don't share any state, so several of them can exist and be updated in the same process.
+    """
+    def __init__(self, screen = None):
+        self.screen = screen #Surface or Renderer the world is drawn on, None if it never gets drawn
+        self.keys = None #Keys held this frame, anything indexable by pygame key constants
+        self.delta_time = c.TIME_STEP
+        self.interpolator = Interpolator()
+        self.random = random.Random() #Seeded by recordings and replays, restored with snapshots
+
+        self.camera = None
+        self.mario = None
+        self.flagpole = None
+
+        #Score values
+        self.total_score = 0
+        self.collected_coins = 0
+        self.final_count_down = False
+
+        #Physics values mario's states change while playing
+        self.acceleration = 0
+        self.friction = 1
+
+        #Settings of the stage that is currently loaded, see stages.py
+        self.stage = None
+        self.background = None #Images stay None in worlds without a screen
+        self.foreground = None
+        self.foreground_pos = None
+        self.maximum_camera_scroll = None
+        self.level_end_x = None
+
+        #Chunks that have been loaded are in chunks[first_loaded:next_to_load]
+        self.chunks = []
+        self.first_loaded = 0
+        self.next_to_load = 0
+
+        #Stage index -> (worker thread, list the prepared stage gets appended to)
+        self.prefetched = {}
+
+        #Owns the colliders that don't possess velocity and the tiles that possess velocity, created per stage
+        self.collision_world = None
+
+        #Positions, velocities and sizes of the enemies as arrays, created per stage
+        self.enemy_store = None
+
+        #Broadphase for collisions between mario, items and enemies, updated once per frame
+        self.entity_sweep = Sweep_And_Prune()
+
+        #Objects that need updating this frame, enemies wait in its queue until the camera reaches them
+        self.scheduler = Scheduler()
+
+        self.coins = Object_List()
+        self.super_mushrooms = Object_List()
+        self.enemies = Object_List()
+
+        #Fragments go here when a brick tile gets broken, they are reused once they have fallen off screen
+        self.brick_fragments = Object_List()
+        self.fragment_pool = Pool(self.create_fragment)
+
+        #uid -> object, for every object that is part of the level right now, see get_object
+        self.objects = {}
+        self.records = [] #Layout records of the stage, objects created from record n have uid 2 * n and 2 * n + 1
+        self.next_uid = 0 #Objects that aren't created from a record get uids counting up from here
+
+        #(list, object, pool) of objects destroyed this frame, see destroy and compact
+        self.destroyed = []
+
+    def register(self, obj, uid):
+        obj.uid = uid
+        self.objects[uid] = obj
+
+    def forget(self, obj):
+        """Drops an object that left the level, get_object creates it again if a snapshot needs it
+
+        Tiles and coins belong to their chunk until it unloads, entities leave when they are destroyed.
+        """
+        if self.objects.get(obj.uid) is obj:
+            del self.objects[obj.uid]
+
+    def get_object(self, uid):
+        """Returns the object with a uid, objects that don't exist in this world are created like the first time"""
+        obj = self.objects.get(uid)
+        if obj is None:
+            if uid < 2 * len(self.records):
+                self.create_record(uid // 2)
+                obj = self.objects[uid]
+            else:
+                obj = Brick_Fragment(self)
+                self.register(obj, uid)
+        return obj
+
+    def create_record(self, number):
+        """Creates the objects of a layout record again, keeping the ones that still exist
+
+        A question block and its contents leave the level at different times, so only one of them may be gone.
+        """
+        kept = [self.objects[uid] for uid in (2 * number, 2 * number + 1) if uid in self.objects]
+        create_objects(self, number, self.records[number])
+        for obj in kept:
+            self.register(obj, obj.uid)
+
+        question = self.objects[2 * number]
+        if hasattr(question, 'contents'):
+            question.contents = self.objects[2 * number + 1]
+
+    def get_live_objects(self):
+        """Returns every object that is part of the level right now"""
+        objects = [self.mario, self.flagpole, *self.coins, *self.super_mushrooms, *self.enemies,
+                   *self.brick_fragments, *self.fragment_pool.free]
+        for chunk in self.chunks[self.first_loaded:self.next_to_load]:
+            objects += chunk.static_colliders + chunk.dynamic_colliders + chunk.coins
+        return objects
+
+    def create_fragment(self):
+        """Creates a fragment for the fragment pool, reuses the one with the next uid if a restored snapshot left one"""
+        fragment = self.get_object(self.next_uid)
+        self.next_uid += 1
+        return fragment
+
+    def destroy(self, object_list, obj, pool = None):
+        """Removes an object from a list at the end of the frame, and gives it back to a pool after that"""
+        self.destroyed.append((object_list, obj, pool))
+
+    def compact(self):
+        """Removes the objects destroyed this frame from their lists, each removal takes the same time however long the list is"""
+        for object_list, obj, pool in self.destroyed:
+            object_list.remove(obj)
+
+        #Only reuse objects once they are out of their lists
+        for object_list, obj, pool in self.destroyed:
+            if pool is not None:
+                pool.release(obj)
+        self.destroyed.clear()
+        self.collision_world.compact()
+
+    def remove_enemy(self, enemy):
+        """Removes an enemy from the level, the broadphase, the scheduler, the enemy store and the objects"""
+        self.destroy(self.enemies, enemy)
+        self.entity_sweep.remove(enemy)
+        self.scheduler.remove('enemies', enemy)
+        self.enemy_store.remove(enemy)
+        self.forget(enemy)
+
+    def is_behind_camera(self, obj):
+        """Checks if an object is completely left of the camera, which never scrolls back"""
+        return obj.pos.x + obj.rect.w < self.camera.pos.x
+
+    def update_chunks(self):
+        """Load chunks the camera or an active entity is getting close to and unload chunks the camera has passed for good"""
+        load_x = self.get_front_x() + c.CHUNK_LOAD_DISTANCE
+        while self.next_to_load < len(self.chunks) and self.chunks[self.next_to_load].start_x < load_x:
+            self.chunks[self.next_to_load].load(self)
+            self.next_to_load += 1
+
+        while self.first_loaded < self.next_to_load and self.chunks[self.first_loaded].end_x < self.camera.pos.x:
+            self.chunks[self.first_loaded].unload(self)
+            self.first_loaded += 1
+
+    def get_front_x(self):
+        """Returns the right edge of the camera, or of the active entity furthest right if that is further
+
+        Kicked shells and mushrooms move ahead of the camera, the level has to exist where they are going.
+        """
+        front_x = self.camera.pos.x + c.SCREEN_SIZE.x
+        for kind in ('enemies', 'mushrooms'):
+            for entity in self.scheduler.active.get(kind, ()):
+                front_x = max(front_x, entity.pos.x + entity.rect.w)
+        return front_x
+
+    def prefetch_stage(self, index):
+        """Start preparing a stage on a worker thread, so switching to it doesn't stall the game
+
+        The images are only decoded too if the world gets drawn, games without a screen never need them.
+        """
+        if index >= len(stages.STAGES) or index in self.prefetched or stages.STAGES[index] in prepared_stages:
+            return
+
+        result = []
+        decode_images = self.screen is not None
+        def prepare():
+            prepared = Prepared_Stage(stages.STAGES[index])
+            if decode_images:
+                prepared.decode_images()
+            result.append(prepared)
+
+        thread = threading.Thread(target = prepare, daemon = True)
+        thread.start()
+        self.prefetched[index] = (thread, result)
+
+    def get_prepared_stage(self, index):
+        """Returns a prepared stage, only waits for the worker if it hasn't finished yet
+
+        Stages are prepared once per process, later worlds loading the same stage reuse it.
+        """
+        stage = stages.STAGES[index]
+        prepared = prepared_stages.get(stage)
+        if index in self.prefetched:
+            thread, result = self.prefetched.pop(index)
+            thread.join()
+            if result and prepared is None:
+                prepared = result[0]
+
+        #Not prefetched, or the worker failed, in which case preparing it again raises the error here
+        if prepared is None:
+            prepared = Prepared_Stage(stage)
+        prepared_stages[stage] = prepared
+        return prepared
+
+    def load_stage(self, index):
+        """Replace all level objects by the ones of a stage, place mario at the start and prefetch the stage after it"""
+        prepared = self.get_prepared_stage(index)
+        self.stage = prepared.stage
+        if self.screen is not None:
+            self.background, self.foreground = prepared.get_images()
+        self.chunks = [chunk.copy() for chunk in prepared.chunks]
+        self.first_loaded = 0
+        self.next_to_load = 0
+        self.objects = {}
+        self.records = prepared.records
+        self.next_uid = 2 * len(self.records)
+
+        for object_list in [self.coins, self.super_mushrooms, self.enemies, self.brick_fragments]:
+            object_list.clear()
+        self.destroyed.clear()
+        self.scheduler.clear()
+        self.collision_world = Collision_World(prepared.columns, prepared.rows)
+        self.enemy_store = Enemy_Store(prepared.enemy_count)
+
+        self.foreground_pos = Vector2(*self.stage.foreground_pos)
+        self.maximum_camera_scroll = self.stage.maximum_camera_scroll
+        self.level_end_x = self.stage.level_end_x
+
+        #Instantiate flagpole
+        x, y, w, h = self.stage.flagpole_rect
+        self.flagpole = Flagpole(self, Rectangle(Vector2(x, y), w, h), Vector2(*self.stage.flag_pos))
+        self.register(self.flagpole, self.next_uid)
+
+        self.camera = Camera(self, Vector2(), c.SCREEN_SIZE.x, c.SCREEN_SIZE.y)
+        start_pos = Vector2(c.MARIO_START_POSITION.x, c.MARIO_START_POSITION.y)
+        self.mario = Mario(self, Rectangle(start_pos, 36, 48))
+        self.register(self.mario, self.next_uid + 1)
+        self.next_uid += 2
+        self.update_chunks()
+
+        self.acceleration = 0
+        self.friction = 1
+        self.final_count_down = False
+
+        self.prefetch_stage(index + 1)
+
+    def snapshot(self):
+        """Returns the state of the world as plain values that marshal can store, take it between frames
+
+        Objects are referred to by their uid. Static colliders never change, so only the uids of those are stored.
+        """
+        loaded = self.chunks[self.first_loaded:self.next_to_load]
+        objects = [self.mario, self.flagpole, *self.super_mushrooms, *self.enemies, *self.brick_fragments]
+        for chunk in loaded:
+            objects += chunk.dynamic_colliders + chunk.coins
+
+        return ((self.delta_time, self.total_score, self.collected_coins, self.final_count_down,
+                 self.acceleration, self.friction, self.next_uid),
+                (self.camera.pos.x, self.camera.pos.y, self.camera.view_x),
+                [(obj.uid, obj.get_snapshot()) for obj in objects],
+                (self.first_loaded, self.next_to_load, [chunk.get_snapshot() for chunk in loaded]),
+                [[obj.uid for obj in object_list] for object_list in
+                 [self.coins, self.super_mushrooms, self.enemies, self.brick_fragments, self.fragment_pool.free]],
+                self.collision_world.get_snapshot(),
+                self.enemy_store.get_snapshot(),
+                self.entity_sweep.get_snapshot(),
+                self.scheduler.get_snapshot())
+
+    def restore(self, snapshot):
+        """Sets the state returned by snapshot, the same stage has to be loaded already"""
+        values, camera, objects, chunks, object_lists, colliders, enemy_store, sweep, scheduler = snapshot
+        (self.delta_time, self.total_score, self.collected_coins, self.final_count_down,
+         self.acceleration, self.friction, self.next_uid) = values
+        self.camera.pos.x, self.camera.pos.y, self.camera.view_x = camera
+
+        #Objects first, the collision world and the enemy store read their positions and sizes
+        for uid, object_snapshot in objects:
+            self.get_object(uid).restore_snapshot(object_snapshot)
+
+        self.first_loaded, self.next_to_load, loaded = chunks
+        for chunk in self.chunks:
+            chunk.clear()
+        for chunk, chunk_snapshot in zip(self.chunks[self.first_loaded:self.next_to_load], loaded):
+            chunk.restore_snapshot(chunk_snapshot, self.get_object)
+
+        coins, super_mushrooms, enemies, brick_fragments, free_fragments = object_lists
+        self.coins = Object_List(self.get_object(uid) for uid in coins)
+        self.super_mushrooms = Object_List(self.get_object(uid) for uid in super_mushrooms)
+        self.enemies = Object_List(self.get_object(uid) for uid in enemies)
+        self.brick_fragments = Object_List(self.get_object(uid) for uid in brick_fragments)
+        self.fragment_pool.free = [self.get_object(uid) for uid in free_fragments]
+        self.destroyed.clear()
+
+        self.collision_world.restore_snapshot(colliders, self.get_object)
+        self.enemy_store.restore_snapshot(enemy_store, self.get_object)
+        self.entity_sweep.restore_snapshot(sweep, self.get_object)
+        self.scheduler.restore_snapshot(scheduler, self.get_object)
+
+        #Objects of chunks that weren't loaded at the time of the snapshot are dropped, like unloading does
+        self.objects = {obj.uid: obj for obj in self.get_live_objects()}
+
+        #Nothing to blend with until the next step
+        self.interpolator.previous = {}
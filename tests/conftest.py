@@ -0,0 +1,17 @@
+import os
+import sys
+
+#The game runs without window and audio while testing
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+@pytest.fixture
+def game():
+    """Headless game at the start of the first stage"""
+    from data.headless import Headless_Game
+    game = Headless_Game()
+    game.reset()
+    return game
@@ -0,0 +1,88 @@
+from data import config as c
+from data.basetypes import Vector2, Rectangle
+from data.components.enemies import Goomba, Turtle
+import pytest
+
+def spawn_goomba(world, x, vel_x):
+    goomba = Goomba(world, Rectangle(Vector2(x, 552), 48, 48), Vector2())
+    goomba.vel.x = vel_x
+    world.register(goomba, world.next_uid)
+    world.next_uid += 1
+    world.enemies.append(goomba)
+    goomba.activate()
+    return goomba
+
+def remove_enemies(world):
+    for enemy in list(world.enemies):
+        world.remove_enemy(enemy)
+    world.compact()
+
+@pytest.mark.parametrize('gap', [40, -6, -20])
+def test_goombas_walking_into_each_other_turn_around(game, gap):
+    """Goombas bounce off each other, also when they already overlapped, which used to freeze them in place"""
+    world = game.main.world
+    remove_enemies(world)
+
+    left = spawn_goomba(world, 300, -c.ENEMY_START_VEL_X)
+    right = spawn_goomba(world, 348 + gap, c.ENEMY_START_VEL_X)
+    game.step((), 40)
+
+    assert left.vel.x < 0 and right.vel.x > 0
+    assert left.pos.x + left.rect.w <= right.pos.x
+    start = (left.pos.x, right.pos.x)
+    game.step((), 10)
+    assert left.pos.x < start[0] and right.pos.x > start[1]
+
+def run_crowd(game, frames):
+    world = game.main.world
+    for i in range(24):
+        spawn_goomba(world, 200 + (i * 61) % 700, c.ENEMY_START_VEL_X).pos.y = 100 + (i // 12) * 30
+    game.step((), frames)
+    return [(enemy.pos.x, enemy.pos.y, enemy.vel.x, enemy.vel.y) for enemy in world.enemies]
+
+def test_enemies_move_the_same_one_by_one_and_in_a_batch(game, monkeypatch):
+    monkeypatch.setattr(c, 'SWEEP_BATCH_MIN', 1)
+    in_batch = run_crowd(game, 120)
+    game.reset()
+    monkeypatch.setattr(c, 'SWEEP_BATCH_MIN', 1000)
+    assert run_crowd(game, 120) == in_batch
+
+def test_enemy_after_a_removed_one_still_moves(game):
+    """Enemies removed while updating used to make the next enemy of the list skip its update for that frame"""
+    world = game.main.world
+    remove_enemies(world)
+    squished = spawn_goomba(world, 400, c.ENEMY_START_VEL_X)
+    walking = spawn_goomba(world, 600, c.ENEMY_START_VEL_X)
+    game.step((), 2)
+
+    #The squished goomba gets removed by its update in the next frame
+    squished.state_machine.on_event(c.SQUISH)
+    squished.animation.squish_delay_over = True
+    timer = walking.animation.anim_timer
+    game.step()
+    assert squished not in world.enemies
+    assert walking.animation.anim_timer == timer + c.TIME_STEP
+
+def test_kicked_shell_bounces_off_a_pipe_ahead_of_the_camera(game):
+    """Chunks used to load only near the camera, so a shell kicked ahead of it went through the pipe at x 8592"""
+    world = game.main.world
+    world.camera.pos.x = 7200
+    world.mario.pos.x, world.mario.pos.y = 7600, 552
+    world.update_chunks()
+
+    shell = Turtle(world, Rectangle(Vector2(7950, 528), 48, 72), Vector2())
+    world.register(shell, world.next_uid)
+    world.next_uid += 1
+    world.enemies.append(shell)
+    shell.activate()
+    shell.state_machine.on_event(c.SQUISH)
+    shell.vel.x = c.SHELL_VEL_X
+    shell.state_machine.on_event(c.MOVE_SHELL)
+
+    furthest = shell.pos.x
+    for frame in range(200):
+        game.step()
+        furthest = max(furthest, shell.pos.x)
+
+    assert furthest + shell.rect.w <= 8592
+    assert shell in world.enemies and shell.pos.y == 558
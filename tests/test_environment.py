@@ -0,0 +1,26 @@
+from data import environment
+import numpy as np
+import pytest
+
+@pytest.mark.parametrize('has_shared_memory', [True, False])
+def test_vector_env_matches_single_envs(monkeypatch, has_shared_memory):
+    """Workers write the same results as environments in this process, with shared memory and with the fallback for Python 3.7"""
+    if not has_shared_memory:
+        monkeypatch.setattr(environment, 'shared_memory', None)
+    single = environment.Mario_Env(grid = True)
+    vector = environment.Vector_Env(2, grid = True)
+    try:
+        expected = single.reset()
+        observations = vector.reset()
+        for row in range(2):
+            assert np.array_equal(observations['mario'][row], expected['mario'])
+            assert np.array_equal(observations['grid'][row], expected['grid'])
+
+        for action in [1, 2, 2, 2, 1, 0, 3]:
+            expected, reward, done, info = single.step(action)
+            observations, rewards, dones = vector.step([action, action])
+            assert np.array_equal(observations['mario'][1], expected['mario'])
+            assert np.array_equal(observations['grid'][1], expected['grid'])
+            assert rewards[1] == np.float32(reward) and dones[1] == done
+    finally:
+        vector.close()
@@ -0,0 +1,106 @@
+from data import config as c
+from data import level_loader
+from data import stages
+from PIL import Image
+import pytest
+import random
+import shutil
+
+KINDS = {c.YELLOW: level_loader.COIN_QUESTION,
+         c.GRAY: level_loader.BRICK,
+         c.GREEN: level_loader.MUSHROOM_QUESTION,
+         c.BROWN: level_loader.GOOMBA,
+         c.PURPLE: level_loader.TURTLE}
+
+def parse_pixels(map_path):
+    """Reads a map pixel by pixel like the game did before parse_map
+
+    Returns the set of ground cells, the top of the pipe colliders in every column and the (kind, x, y) of the
+    other objects in row by row order.
+    """
+    with Image.open(map_path) as image:
+        image = image.convert('RGBA')
+    ground, pipe_tops, objects = set(), {}, []
+    for y in range(image.size[1]):
+        for x in range(image.size[0]):
+            color = image.getpixel((x, y))
+            if color == c.BLACK:
+                ground.add((x, y))
+            elif color == c.RED:
+                #Pipes are two tiles wide and reach down to the bottom of the screen
+                for column in (x, x + 1):
+                    pipe_tops[column] = min(y, pipe_tops.get(column, y))
+            elif color in KINDS:
+                objects.append((KINDS[color], x, y))
+    return ground, pipe_tops, objects
+
+def parse_records(layout):
+    """Returns the same values as parse_pixels from the records of a parsed layout"""
+    ground, pipe_tops, objects = [], {}, []
+    for kind, x, y, w, h in layout:
+        if kind == level_loader.GROUND:
+            ground += [(x + i, y + j) for i in range(w) for j in range(h)]
+        elif kind == level_loader.PIPE:
+            for column in range(x, x + w):
+                pipe_tops[column] = min(y, pipe_tops.get(column, y))
+        else:
+            assert (w, h) == (1, 1)
+            objects.append((kind, x, y))
+
+    #Every ground cell is covered by exactly one collider
+    assert len(ground) == len(set(ground))
+    return set(ground), pipe_tops, objects
+
+def make_map(map_path, seed):
+    """Saves a small map of random pixels, mostly empty and ground"""
+    generator = random.Random(seed)
+    colors = [c.BACKGROUND_COLOR + (255,)] * 8 + [c.BLACK] * 8 + [c.RED] + list(KINDS)
+    image = Image.new('RGBA', (40, 14))
+    for y in range(image.size[1]):
+        for x in range(image.size[0]):
+            image.putpixel((x, y), generator.choice(colors))
+    image.save(map_path)
+
+@pytest.mark.parametrize('seed', [None, 1, 2, 3])
+def test_parse_map_matches_pixel_loop(tmp_path, seed):
+    map_path = stages.STAGES[0].map_path
+    if seed is not None:
+        map_path = str(tmp_path / 'map.png')
+        make_map(map_path, seed)
+
+    assert parse_records(level_loader.parse_map(map_path)) == parse_pixels(map_path)
+
+def test_cache_round_trip(tmp_path, monkeypatch):
+    layout = level_loader.parse_map(stages.STAGES[0].map_path)
+    map_hash = level_loader.get_map_hash(stages.STAGES[0].map_path)
+    cache_path = str(tmp_path / 'map.bin')
+
+    level_loader.write_cache(cache_path, map_hash, layout)
+    assert level_loader.read_cache(cache_path, map_hash) == layout
+
+    #Caches written with other parsing rules are ignored
+    monkeypatch.setattr(level_loader, 'CACHE_VERSION', level_loader.CACHE_VERSION + 1)
+    assert level_loader.read_cache(cache_path, map_hash) is None
+
+def test_changed_map_invalidates_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(level_loader, 'cache_folder', str(tmp_path / 'cache'))
+    map_path = str(tmp_path / 'map.png')
+    shutil.copyfile(stages.STAGES[0].map_path, map_path)
+    layout = level_loader.load_layout(map_path)
+    old_hash = level_loader.get_map_hash(map_path)
+    cache_path = level_loader.get_cache_path(map_path)
+    assert level_loader.read_cache(cache_path, old_hash) == layout
+
+    #Put a goomba into the top left corner of the map
+    with Image.open(map_path) as image:
+        image = image.convert('RGBA')
+    image.putpixel((0, 0), c.BROWN)
+    image.save(map_path)
+
+    new_hash = level_loader.get_map_hash(map_path)
+    assert new_hash != old_hash
+    assert level_loader.read_cache(cache_path, new_hash) is None
+
+    new_layout = level_loader.load_layout(map_path)
+    assert new_layout == [(level_loader.GOOMBA, 0, 0, 1, 1)] + layout
+    assert level_loader.read_cache(cache_path, new_hash) == new_layout
@@ -0,0 +1,25 @@
+from data.headless import Headless_Game
+from data.replay import Recorder, Replay
+import Mario_Bros
+import argparse
+import pygame as pg
+import pytest
+
+@pytest.mark.parametrize('draw', [False, True])
+def test_replay_plays_like_the_recorded_game(tmp_path, draw):
+    recorder = Recorder(seed = 5)
+    game = Headless_Game(draw = draw, recorder = recorder)
+    game.reset()
+    for frame in range(200):
+        game.step((pg.K_d, pg.K_SPACE) if frame % 40 < 20 else (pg.K_d,))
+    recorder.save(str(tmp_path / 'game.replay'))
+
+    replay = Replay.load(str(tmp_path / 'game.replay'))
+    other = Headless_Game(draw = draw)
+    assert other.play(replay) == 200
+    assert other.snapshot() == game.snapshot()
+
+@pytest.mark.parametrize('uncapped, restart_args', [(False, []), (True, ['--uncapped'])])
+def test_restart_neither_records_nor_replays(uncapped, restart_args):
+    args = argparse.Namespace(record = 'game.replay', replay = 'game.replay', uncapped = uncapped)
+    assert Mario_Bros.get_restart_args(args) == restart_args
@@ -0,0 +1,69 @@
+from data.headless import Headless_Game
+import pygame as pg
+import random
+
+def get_inputs(frame):
+    """Runs right and jumps every 40 frames, which gets past the first pits of the first stage"""
+    return (pg.K_d, pg.K_SPACE) if frame % 40 < 20 else (pg.K_d,)
+
+def play(game, start, end):
+    for frame in range(start, end):
+        game.step(get_inputs(frame))
+
+def test_restore_continues_like_the_snapshot_did(game):
+    play(game, 0, 300)
+    snapshot = game.snapshot()
+    play(game, 300, 780)
+    final = game.snapshot()
+    assert game.main.world.first_loaded > 0 #The chunks of the snapshot have been unloaded since
+
+    game.restore(snapshot)
+    play(game, 300, 780)
+    assert game.snapshot() == final
+
+    other = Headless_Game()
+    other.reset()
+    other.restore(snapshot)
+    play(other, 300, 780)
+    assert other.snapshot() == final
+
+def test_only_objects_in_the_level_are_kept(game):
+    def check():
+        world = game.main.world
+        live = world.get_live_objects()
+        assert sorted(map(id, world.objects.values())) == sorted(set(map(id, live)))
+
+    play(game, 0, 300)
+    snapshot = game.snapshot()
+    play(game, 300, 780)
+    check()
+    game.restore(snapshot)
+    check()
+
+def test_recreated_question_block_keeps_its_contents(game):
+    """A question block can leave the level while the mushroom it held walks on, or the other way around"""
+    world = game.main.world
+    question = next(obj for obj in world.objects.values() if hasattr(obj, 'contents'))
+    contents = question.contents
+    world.forget(question)
+
+    recreated = world.get_object(question.uid)
+    assert recreated is not question
+    assert recreated.contents is contents
+    assert world.get_object(contents.uid) is contents
+
+def test_restore_only_rewinds_the_rng_of_its_own_game(game):
+    """Snapshots used to store the process wide rng, so restoring one game changed the random numbers of all others"""
+    play(game, 0, 10)
+    snapshot = game.snapshot()
+    game.main.world.random.random()
+
+    other = Headless_Game()
+    other.reset()
+    state = other.main.world.random.getstate()
+    global_state = random.getstate()
+    game.restore(snapshot)
+
+    assert other.main.world.random.getstate() == state
+    assert random.getstate() == global_state
+    assert game.snapshot() == snapshot
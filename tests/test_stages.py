@@ -0,0 +1,80 @@
+from data import config as c
+from data import stages
+from data.headless import Headless_Game
+from data.level import Prepared_Stage
+import pygame as pg
+import threading
+import pytest
+
+def record_threads(monkeypatch, name):
+    """Replaces a method of Prepared_Stage by one that also remembers the threads it was called on"""
+    threads = []
+    method = getattr(Prepared_Stage, name)
+    def record(*args):
+        threads.append(threading.current_thread())
+        return method(*args)
+    monkeypatch.setattr(Prepared_Stage, name, record)
+    return threads
+
+@pytest.mark.parametrize('draw', [False, True])
+def test_switches_to_a_prefetched_stage(monkeypatch, draw):
+    #The game has one stage, a second one that reuses its map is enough to switch stages
+    first = stages.STAGES[0]
+    second = stages.Stage('1-2', 'map.png', 'background.png', 'foreground.png', first.foreground_pos,
+                          first.flagpole_rect, first.flag_pos, first.maximum_camera_scroll, first.level_end_x)
+    monkeypatch.setattr(stages, 'STAGES', [first, second])
+
+    game = Headless_Game(draw = draw)
+    game.reset()
+    world = game.main.world
+    assert 1 in world.prefetched
+
+    #The worker decodes the images only for games that draw
+    thread, result = world.prefetched[1]
+    thread.join()
+    assert (result[0].decoded is not None) == draw
+
+    #Remember which threads prepare and convert stages from now on
+    prepared_on = record_threads(monkeypatch, '__init__')
+    converted_on = record_threads(monkeypatch, 'get_images')
+
+    for frame in range(60):
+        game.step((pg.K_d,))
+
+    #Winning the first stage switches to the second once the win song ends
+    game.main.time.update_value(0)
+    pg.event.clear()
+    pg.event.post(pg.event.Event(c.WIN_SONG_END))
+    assert game.main.check_for_quit()
+
+    assert game.main.stage_index == 1
+    assert world.stage is second
+    assert world.prefetched == {}
+    assert world.mario.pos.x == c.MARIO_START_POSITION.x
+    assert prepared_on == [] #Prepared by the worker before
+    if draw:
+        #Converting the images uses the display, so that is left to the main thread
+        assert converted_on == [threading.main_thread()]
+        assert world.foreground is result[0].images[1]
+    else:
+        assert converted_on == []
+        assert world.background is None and world.foreground is None
+
+    for frame in range(60):
+        game.step((pg.K_d,))
+    assert world.mario.pos.x > c.MARIO_START_POSITION.x
+
+def test_reset_reuses_the_prepared_stage(monkeypatch):
+    game = Headless_Game()
+    game.reset()
+    chunks = game.main.world.chunks
+
+    prepared_on = record_threads(monkeypatch, '__init__')
+    images = []
+    monkeypatch.setattr(pg.image, 'load', lambda path: images.append(path))
+    game.reset()
+
+    #The chunks of every world are its own, they get filled while playing
+    assert prepared_on == [] and images == []
+    assert game.main.world.chunks[0] is not chunks[0]
+    assert game.main.world.chunks[0].records is chunks[0].records
@@ -0,0 +1,22 @@
+from test_enemies import spawn_goomba, remove_enemies
+
+def test_removed_objects_leave_their_lists_in_order(game):
+    """Lists used to be rebuilt whenever an object was destroyed"""
+    world = game.main.world
+    remove_enemies(world)
+    goombas = [spawn_goomba(world, 300 + 60 * i, 0) for i in range(5)]
+    enemies = world.enemies
+    world.remove_enemy(goombas[2])
+    world.remove_enemy(goombas[2]) #Destroying twice in one frame does no harm
+    world.compact()
+    assert world.enemies is enemies
+    assert list(world.enemies) == goombas[:2] + goombas[3:]
+
+    collision_world = world.collision_world
+    tiles = list(collision_world.dynamic_colliders)
+    dynamic_colliders = collision_world.dynamic_colliders
+    collision_world.remove(tiles[1])
+    assert tiles[1] in dynamic_colliders #Until the end of the frame
+    collision_world.compact()
+    assert collision_world.dynamic_colliders is dynamic_colliders
+    assert list(dynamic_colliders) == tiles[:1] + tiles[2:]